@@ -2,6 +2,7 @@ import streamlit as st
 import pandas as pd
 import json
 import os
+import io
 import re
 from pathlib import Path
 import tempfile
@@ -11,6 +12,8 @@ from streamlit_quill import st_quill
 import html
 import base64
 import traceback
+import functools
+import hashlib
 
 # Import the existing email generator functionality
 import email_file_generator as efg
@@ -35,6 +38,66 @@ except ImportError:
     RECOVERY_AVAILABLE = False
     print("Recovery utilities not available")
 
+# Whole-cell email check mirroring validate_email_address: comma-separated
+# addresses, where [bracketed] entries are skipped as a manual circuit breaker
+_EMAIL_ITEM = r"\s*(?:\[[^,]*\]|[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,})\s*"
+_EMAIL_LIST_RE = re.compile(rf"{_EMAIL_ITEM}(?:,{_EMAIL_ITEM})*")
+
+# Template and HTML patterns, compiled once instead of on every rerun
+_VAR_RE = re.compile(r"\[([^\]]+)\]")
+# Line-break tags (group 1) or any other tag, so HTML is stripped in one scan
+_HTML_TAG_RE = re.compile(r"(<br\s*/?>|</p>|</div>)|<[^>]+>", re.IGNORECASE)
+_MULTI_NL_RE = re.compile(r"\n{3,}")
+# Placeholders never span lines (brackets and newlines survive html.escape)
+_LINE_PLACEHOLDER_RE = re.compile(r"\[[^\]\n]+\]")
+_FOLDER_UNSAFE_RE = re.compile(r"[^\w\s-]")
+
+# Excel columns (lowercased) that map to email header fields
+EMAIL_FIELD_COLUMNS = frozenset({'email', 'to', 'cc', 'bcc', 'from', 'subject'})
+
+# Column names that hold the recipient address, in order of preference
+EMAIL_COLUMN_ALIASES = ('Email', 'email', 'To')
+
+# Columns offered first as per-recipient attachment folder identifiers
+SUGGESTED_IDENTIFIER_COLUMNS = ('FirstName', 'LastName', 'Email', 'Name', 'ID', 'CustomerID')
+
+# Static shell for HTML previews (styling around the email body)
+_PREVIEW_PREFIX = """
+    <html>
+    <head>
+        <style>
+            body {
+                font-family: Arial, sans-serif;
+                font-size: 14px;
+                line-height: 1.6;
+                padding: 20px;
+                background-color: #ffffff;
+            }
+            a {
+                color: #0066cc;
+                text-decoration: none;
+            }
+            a:hover {
+                text-decoration: underline;
+            }
+            ul, ol {
+                margin-left: 20px;
+            }
+            .placeholder {
+                background-color: #fffacd;
+                padding: 2px 4px;
+                border-radius: 3px;
+                font-family: monospace;
+            }
+        </style>
+    </head>
+    <body>
+        """
+_PREVIEW_SUFFIX = """
+    </body>
+    </html>
+    """
+
 # Configure page
 st.set_page_config(
     page_title="Email Generator Workflow",
@@ -43,48 +106,53 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Session state defaults, as factories so mutable and time-dependent
+# values are created fresh for each new session
+SESSION_DEFAULTS = {
+    'template_text': lambda: "",
+    'excel_data': lambda: None,
+    'template_variables': list,
+    'conditional_lines': dict,
+    'attachments_dir': lambda: None,
+    'output_dir': lambda: Path.cwd() / "generated_emails",
+    'current_step': lambda: 1,
+    'template_manager': TemplateManager,
+    'template_mode': lambda: "plain",  # "plain" or "rich"
+    'template_html': lambda: "",
+    'rich_text_content': lambda: "",
+    'attachment_mode': lambda: "global",  # "global" or "per_recipient"
+    'attachment_identifier_column': lambda: None,
+    'per_recipient_attachments_base': lambda: None,
+    'show_folder_mapping': lambda: False,
+    'generated_emails': list,
+    'error_handler': lambda: error_handler,
+    'last_auto_save': datetime.now,
+    'safe_mode': lambda: False,
+}
+
 # Initialize session state with error handling
 try:
-    if 'template_text' not in st.session_state:
-        st.session_state.template_text = ""
-    if 'excel_data' not in st.session_state:
-        st.session_state.excel_data = None
-    if 'template_variables' not in st.session_state:
-        st.session_state.template_variables = []
-    if 'conditional_lines' not in st.session_state:
-        st.session_state.conditional_lines = {}
-    if 'attachments_dir' not in st.session_state:
-        st.session_state.attachments_dir = None
-    if 'output_dir' not in st.session_state:
-        st.session_state.output_dir = Path.cwd() / "generated_emails"
-    if 'current_step' not in st.session_state:
-        st.session_state.current_step = 1
-    if 'template_manager' not in st.session_state:
-        st.session_state.template_manager = TemplateManager()
-    if 'template_mode' not in st.session_state:
-        st.session_state.template_mode = "plain"  # "plain" or "rich"
-    if 'template_html' not in st.session_state:
-        st.session_state.template_html = ""
-    if 'rich_text_content' not in st.session_state:
-        st.session_state.rich_text_content = ""
-    if 'attachment_mode' not in st.session_state:
-        st.session_state.attachment_mode = "global"  # "global" or "per_recipient"
-    if 'attachment_identifier_column' not in st.session_state:
-        st.session_state.attachment_identifier_column = None
-    if 'per_recipient_attachments_base' not in st.session_state:
-        st.session_state.per_recipient_attachments_base = None
-    if 'generated_emails' not in st.session_state:
-        st.session_state.generated_emails = []
-    if 'error_handler' not in st.session_state:
-        st.session_state.error_handler = error_handler
-    if 'last_auto_save' not in st.session_state:
-        st.session_state.last_auto_save = datetime.now()
-    if 'safe_mode' not in st.session_state:
-        st.session_state.safe_mode = False
+    for key, factory in SESSION_DEFAULTS.items():
+        if key not in st.session_state:
+            st.session_state[key] = factory()
 except Exception as e:
     st.error(f"Failed to initialize session state: {str(e)}")
     error_handler.log_error(e, "Session Initialization", severity="CRITICAL")
 
+@functools.lru_cache(maxsize=128)
+def _extract_variables_cached(template_text: str) -> Tuple[str, ...]:
+    """Validate template syntax and return its variables (memoized per template text)"""
+    # Validate template syntax first
+    is_valid, errors = validate_template_syntax(template_text)
+    if not is_valid:
+        error_msg = "Template syntax errors: " + "; ".join(errors)
+        raise ValueError(error_msg)
+    
+    # Extract variables
+    all_vars = _VAR_RE.findall(template_text)
+    # Filter out conditional placeholders
+    return tuple(var for var in all_vars if not var.startswith("Conditional:"))
+
 @SafeOperation(error_handler, "Template Variable Extraction")
 def extract_variables(template_text: str) -> List[str]:
     """Extract variables from template text with error handling"""
@@ -92,17 +160,7 @@ def extract_variables(template_text: str) -> List[str]:
         if not template_text:
             return []
         
-        # Validate template syntax first
-        is_valid, errors = validate_template_syntax(template_text)
-        if not is_valid:
-            error_msg = "Template syntax errors: " + "; ".join(errors)
-            raise ValueError(error_msg)
-        
-        # Extract variables
-        all_vars = re.findall(r"\[([^\]]+)\]", template_text)
-        # Filter out conditional placeholders
-        regular_vars = [var for var in all_vars if not var.startswith("Conditional:")]
-        return regular_vars
+        return list(_extract_variables_cached(template_text))
     except Exception as e:
         error_handler.log_error(e, "Extract Variables")
         return []
@@ -112,20 +170,15 @@ def convert_html_to_plain(html_content: str) -> str:
     if not html_content:
         return ""
     
-    # Remove HTML tags but preserve content
-    import re
-    # First, replace <br> and </p> with newlines
-    text = html_content.replace('<br>', '\n').replace('<br/>', '\n').replace('<br />', '\n')
-    text = text.replace('</p>', '\n').replace('</div>', '\n')
-    
-    # Remove all other HTML tags
-    text = re.sub(r'<[^>]+>', '', text)
+    # Remove HTML tags but preserve content, turning <br>, </p> and </div>
+    # into newlines in the same pass
+    text = _HTML_TAG_RE.sub(lambda m: '\n' if m.group(1) else '', html_content)
     
     # Decode HTML entities
     text = html.unescape(text)
     
     # Clean up excessive newlines
-    text = re.sub(r'\n{3,}', '\n\n', text)
+    text = _MULTI_NL_RE.sub('\n\n', text)
     
     return text.strip()
 
@@ -134,63 +187,152 @@ def convert_plain_to_html(plain_text: str) -> str:
     if not plain_text:
         return ""
     
-    # Escape HTML special characters but preserve placeholders
-    lines = plain_text.split('\n')
-    html_lines = []
-    
-    for line in lines:
-        # Don't escape content within brackets (our placeholders)
-        parts = re.split(r'(\[[^\]]+\])', line)
-        escaped_parts = []
-        for part in parts:
-            if part.startswith('[') and part.endswith(']'):
-                # This is a placeholder, keep it as-is
-                escaped_parts.append(part)
-            else:
-                # Regular text, escape HTML
-                escaped_parts.append(html.escape(part))
-        html_lines.append(''.join(escaped_parts))
+    # Escape HTML special characters, then restore placeholders as-is
+    escaped = html.escape(plain_text)
+    escaped = _LINE_PLACEHOLDER_RE.sub(lambda m: html.unescape(m.group(0)), escaped)
     
-    # Join lines with <br> tags
-    return '<br>'.join(html_lines)
+    # Convert line breaks to <br> tags
+    return escaped.replace('\n', '<br>')
 
 def create_html_preview(html_content: str) -> str:
     """Create a preview of the HTML email with basic styling."""
-    preview_html = f"""
-    <html>
-    <head>
-        <style>
-            body {{
-                font-family: Arial, sans-serif;
-                font-size: 14px;
-                line-height: 1.6;
-                padding: 20px;
-                background-color: #ffffff;
-            }}
-            a {{
-                color: #0066cc;
-                text-decoration: none;
-            }}
-            a:hover {{
-                text-decoration: underline;
-            }}
-            ul, ol {{
-                margin-left: 20px;
-            }}
-            .placeholder {{
-                background-color: #fffacd;
-                padding: 2px 4px;
-                border-radius: 3px;
-                font-family: monospace;
-            }}
-        </style>
-    </head>
-    <body>
-        {html_content}
-    </body>
-    </html>
+    return _PREVIEW_PREFIX + html_content + _PREVIEW_SUFFIX
+
+@st.cache_data(show_spinner=False)
+def list_saved_templates(_manager: TemplateManager, templates_dir: str, dir_mtime: float) -> List[Dict[str, Any]]:
+    """List saved templates, cached until the templates directory changes"""
+    return _manager.list_templates()
+
+@st.cache_data(show_spinner=False)
+def load_excel_data(file_bytes: bytes) -> pd.DataFrame:
+    """Parse uploaded Excel bytes, cached so reruns with the same file skip re-parsing"""
+    return pd.read_excel(io.BytesIO(file_bytes), engine=efg.EXCEL_ENGINE)
+
+@st.cache_data(show_spinner=False)
+def build_column_info(df: pd.DataFrame) -> pd.DataFrame:
+    """Summarize non-null counts, dtypes and sample values for every column"""
+    samples = [', '.join(str(x) for x in df[col].dropna().head(3).tolist()) for col in df.columns]
+    return pd.DataFrame({
+        'Column': df.columns,
+        'Non-null Count': df.count().values,
+        'Data Type': df.dtypes.astype(str).values,
+        'Sample Values': samples
+    })
+
+def find_column(df: pd.DataFrame, candidates: Tuple[str, ...]) -> Optional[str]:
+    """Return the first of the candidate column names present in df, if any"""
+    return next((col for col in candidates if col in df.columns), None)
+
+def _dir_mtime(path: Path) -> float:
+    """Modification time of a directory, used as a cache key (0.0 if missing)"""
+    try:
+        return path.stat().st_mtime
+    except OSError:
+        return 0.0
+
+def _scan_files(dirpath: Path) -> List[Tuple[str, int]]:
+    """List (name, size in bytes) for the files in a directory.
+
+    os.scandir hands back the entry type (and on Windows the size) from the
+    directory read itself, saving the extra stat calls of glob + is_file.
+    Raises OSError if the directory is missing.
     """
-    return preview_html
+    with os.scandir(dirpath) as it:
+        return [(e.name, e.stat().st_size) for e in it if e.is_file()]
+
+@st.cache_data(ttl=30, show_spinner=False)
+def list_directory_files(dir_path: str, dir_mtime: float) -> List[Tuple[str, int]]:
+    """List (name, size in bytes) for the files in a directory, cached until it changes"""
+    try:
+        return _scan_files(Path(dir_path))
+    except OSError:
+        return []
+
+@st.cache_data(ttl=30, show_spinner=False)
+def build_attachments_table(dir_path: str, dir_mtime: float) -> pd.DataFrame:
+    """Filename, size and type of each file in the global attachments folder"""
+    files = list_directory_files(dir_path, dir_mtime)
+    return pd.DataFrame({
+        'Filename': [name for name, _ in files],
+        'Size (MB)': [size / (1024 * 1024) for _, size in files],
+        'Type': [Path(name).suffix for name, _ in files]
+    })
+
+@st.cache_data(ttl=30, show_spinner=False)
+def build_folder_mapping(df: pd.DataFrame, base_path: str, identifier_column: str, base_mtime: float) -> pd.DataFrame:
+    """Map every recipient to its attachment folder with file counts and sizes"""
+    base = Path(base_path)
+    # One scan of the base directory instead of a stat per recipient. Names
+    # are casefolded so this only ever over-matches on case-sensitive
+    # filesystems; the per-folder scan below stays the source of truth.
+    try:
+        with os.scandir(base) as it:
+            existing_folders = {e.name.casefold() for e in it if e.is_dir()}
+    except OSError:
+        existing_folders = set()
+    email_column = find_column(df, EMAIL_COLUMN_ALIASES)
+    recipients = df[email_column].tolist() if email_column else [f'Row {idx+1}' for idx in df.index]
+    # Clean identifiers for folder names (remove special characters) in one
+    # vectorized pass; map(str) matches str() for dates and missing values,
+    # astype(str) keeps the .str accessor valid for an empty column
+    identifiers = df[identifier_column].map(str).astype(str)
+    clean_identifiers = identifiers.str.replace(_FOLDER_UNSAFE_RE, '', regex=True).str.strip()
+    
+    # Accumulate straight into columns rather than one dict per recipient
+    columns = {name: [] for name in ('Recipient', 'Identifier', 'Folder', 'Path', 'Exists', 'Files', 'Size (MB)', 'Sample Files')}
+    for recipient, identifier_value, clean_identifier in zip(recipients, identifiers, clean_identifiers):
+        if not clean_identifier:
+            continue
+        folder_path = base / clean_identifier
+
+        # Check folder existence and count files in one scan
+        files = []
+        exists = False
+        if clean_identifier.casefold() in existing_folders:
+            try:
+                files = _scan_files(folder_path)
+                exists = True
+            except OSError:
+                pass
+        sample_files = [name for name, _ in files[:4]]
+
+        columns['Recipient'].append(recipient)
+        columns['Identifier'].append(identifier_value)
+        columns['Folder'].append(clean_identifier)
+        columns['Path'].append(str(folder_path))
+        columns['Exists'].append('✅' if exists else '❌')
+        columns['Files'].append(len(files))
+        columns['Size (MB)'].append(sum(size for _, size in files))  # bytes, converted below
+        columns['Sample Files'].append(', '.join(sample_files[:3]) + ('...' if len(sample_files) > 3 else '') if sample_files else 'None')
+    # Give the numeric and two-valued columns their dtypes up front rather
+    # than having pandas infer them, converting byte totals to MB in one step
+    columns['Exists'] = pd.Categorical(columns['Exists'], categories=['✅', '❌'])
+    columns['Files'] = pd.Series(columns['Files'], dtype='int32')
+    columns['Size (MB)'] = pd.Series(columns['Size (MB)'], dtype='int64') / (1024 * 1024)
+    return pd.DataFrame(columns)
+
+@st.cache_data(show_spinner=False)
+def load_conditional_lines(path: str, mtime: float) -> Dict[str, Any]:
+    """Parse a conditional lines JSON file, cached until its mtime changes"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+@st.cache_data(show_spinner=False)
+def conditional_lines_text(path: str, mtime: float) -> str:
+    """Conditional lines file pretty-printed for the step 5 editor"""
+    return json.dumps(load_conditional_lines(path, mtime), indent=2, ensure_ascii=False)
+
+def save_conditional_lines(path: str, conditional_lines: Dict[str, Any]) -> None:
+    """Write conditional lines to disk, skipping the write if the file already matches"""
+    try:
+        saved = load_conditional_lines(path, os.path.getmtime(path))
+        # Compare in order too, since conditional lines are applied in key order
+        if list(saved.items()) == list(conditional_lines.items()):
+            return
+    except (OSError, ValueError, AttributeError):
+        pass
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(conditional_lines, f, indent=2, ensure_ascii=False)
 
 def validate_excel_columns(df: pd.DataFrame, required_vars: List[str]) -> Dict[str, Any]:
     """Validate Excel columns against template variables with comprehensive error checking"""
@@ -220,14 +362,12 @@ def validate_excel_columns(df: pd.DataFrame, required_vars: List[str]) -> Dict[s
         
         # Validate email addresses if email column exists
         if has_email:
-            for idx, row in df.iterrows():
-                email = row.get(email_col, '')
-                # Handle NaN and None values
-                if pd.isna(email) or email == '':
-                    continue  # Skip empty email rows
-                email = str(email).strip()
-                if not email:
-                    continue  # Skip whitespace-only emails
+            # Skip empty and whitespace-only emails, then match all rows in one pass
+            emails = df[email_col].dropna().astype(str).str.strip()
+            emails = emails[emails != '']
+            invalid = emails[~emails.str.fullmatch(_EMAIL_LIST_RE).astype(bool)]
+            # Only the reported rows need the detailed error message
+            for idx, email in invalid.head(5).items():
                 is_valid, error = validate_email_address(email)
                 if not is_valid:
                     invalid_emails.append(f"Row {idx+1}: {error}")
@@ -258,28 +398,26 @@ def validate_excel_columns(df: pd.DataFrame, required_vars: List[str]) -> Dict[s
             'error': str(e)
         }
 
-def create_preview_email(row: pd.Series, template_text: str, variables: List[str], conditional_lines: Dict[str, str], is_html: bool = False) -> str:
-    """Create a preview of what the email would look like for a given row"""
-    # Use HTML template if in rich text mode
+def get_preview_template(template_text: str, is_html: bool = False) -> str:
+    """Return the template used for previews (HTML version in rich text mode)"""
     if is_html and st.session_state.template_mode == "rich" and st.session_state.template_html:
-        template_to_use = st.session_state.template_html
-    else:
-        template_to_use = template_text
-    
-    # Fill template with row data
-    preview = efg.fill_template(template_to_use, row, variables)
-    
-    # Handle conditional placeholders
-    conditional_placeholders = re.findall(r"\[Conditional:([^\]]+)\]", preview)
-    for placeholder_key in conditional_placeholders:
-        placeholder_tag = f"[Conditional:{placeholder_key}]"
-        replacement_text = ""
-        if placeholder_key in conditional_lines and placeholder_key in row and row[placeholder_key] == 1:
-            raw_text = conditional_lines[placeholder_key]
-            replacement_text = efg.fill_template(raw_text, row, variables)
-        preview = preview.replace(placeholder_tag, replacement_text)
-    
-    return preview
+        return st.session_state.template_html
+    return template_text
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def create_preview_email(row: pd.Series, template_text: str, variables: List[str], conditional_lines: Dict[str, str]) -> str:
+    """Create a preview of what the email would look like for a given row.
+
+    template_text is the template to fill as-is (see get_preview_template):
+    the cache is keyed on the arguments only, so it must not read session state.
+    """
+    # Fill template and conditional lines exactly as generation does
+    return efg.fill_body(row, template_text, variables, conditional_lines)
+
+def create_preview_emails(df: pd.DataFrame, template_text: str, variables: List[str], conditional_lines: Dict[str, str], is_html: bool = False) -> List[str]:
+    """Create previews for every row, with values checked and cleaned column-wise once"""
+    template_to_use = get_preview_template(template_text, is_html)
+    return efg.fill_bodies(df, template_to_use, variables, conditional_lines)
 
 def main():
     st.title("📧 Email Generator Workflow")
@@ -315,8 +453,10 @@ def main():
         if output_path != str(st.session_state.output_dir):
             st.session_state.output_dir = Path(output_path)
         
-        # Create output directory if it doesn't exist
-        st.session_state.output_dir.mkdir(exist_ok=True)
+        # Create output directory if it doesn't exist (once per path)
+        if st.session_state.get('output_dir_ensured') != str(st.session_state.output_dir):
+            st.session_state.output_dir.mkdir(exist_ok=True)
+            st.session_state.output_dir_ensured = str(st.session_state.output_dir)
         st.success(f"Output: {st.session_state.output_dir}")
         
         st.divider()
@@ -324,8 +464,13 @@ def main():
         # Template Library Section
         st.header("📚 Template Library")
         
-        # List available templates
-        templates = st.session_state.template_manager.list_templates()
+        # List available templates (re-read only when the directory changes)
+        template_manager = st.session_state.template_manager
+        templates = list_saved_templates(
+            template_manager,
+            str(template_manager.templates_dir),
+            template_manager.templates_dir.stat().st_mtime
+        )
         
         if templates:
             st.subheader("Available Templates")
@@ -375,6 +520,7 @@ def main():
                             if st.button("Confirm Delete", key=f"confirm_delete_{template['filename']}", type="primary"):
                                 result = st.session_state.template_manager.delete_template(template['filename'])
                                 if result['success']:
+                                    list_saved_templates.clear()
                                     st.success(result['message'])
                                     st.rerun()
                                 else:
@@ -410,6 +556,8 @@ def main():
                         template_html=st.session_state.template_html if st.session_state.template_mode == "rich" else None
                     )
                     if result['success']:
+                        # Overwrites don't change the directory mtime
+                        list_saved_templates.clear()
                         st.success(result['message'])
                         st.balloons()
                         st.rerun()
@@ -627,9 +775,11 @@ def step_2_excel_upload():
     
     if uploaded_file:
         try:
-            # Read Excel file
-            df = pd.read_excel(uploaded_file)
+            # Read Excel file (cached on the uploaded bytes)
+            file_bytes = uploaded_file.getvalue()
+            df = load_excel_data(file_bytes)
             st.session_state.excel_data = df
+            st.session_state.excel_hash = hashlib.md5(file_bytes).hexdigest()
             
             st.success(f"✅ Loaded {len(df)} rows from Excel file")
             
@@ -637,19 +787,10 @@ def step_2_excel_upload():
             st.subheader("Data Preview")
             st.dataframe(df.head(10), use_container_width=True)
             
-            # Show column info
+            # Show column info (only built when requested)
             st.subheader("Column Information")
-            col_info = []
-            for col in df.columns:
-                non_null_count = df[col].count()
-                col_info.append({
-                    'Column': col,
-                    'Non-null Count': non_null_count,
-                    'Data Type': str(df[col].dtype),
-                    'Sample Values': ', '.join([str(x) for x in df[col].dropna().head(3).tolist()])
-                })
-            
-            st.dataframe(pd.DataFrame(col_info), use_container_width=True)
+            if st.checkbox("Show column details", key="show_column_info"):
+                st.dataframe(build_column_info(df), use_container_width=True)
             
         except Exception as e:
             st.error(f"Error reading Excel file: {str(e)}")
@@ -679,8 +820,20 @@ def step_3_variable_mapping():
         st.error("Please upload Excel data first")
         return
     
-    # Validate columns
-    validation = validate_excel_columns(st.session_state.excel_data, st.session_state.template_variables)
+    # Validate columns once per template variables / Excel data combination
+    validation_key = (
+        tuple(st.session_state.template_variables),
+        st.session_state.get('excel_hash'),
+        id(st.session_state.excel_data)
+    )
+    if st.session_state.get('column_validation_key') != validation_key:
+        st.session_state.column_validation = validate_excel_columns(
+            st.session_state.excel_data, st.session_state.template_variables
+        )
+        st.session_state.column_validation_key = validation_key
+    validation = st.session_state.column_validation
+    available_cols = set(validation['available_cols'])
+    template_vars = set(st.session_state.template_variables)
     
     col1, col2 = st.columns(2)
     
@@ -688,7 +841,7 @@ def step_3_variable_mapping():
         st.subheader("Template Variables")
         if st.session_state.template_variables:
             for var in st.session_state.template_variables:
-                if var in validation['available_cols']:
+                if var in available_cols:
                     st.success(f"✅ `{var}` - Found in Excel")
                 else:
                     st.error(f"❌ `{var}` - Missing from Excel")
@@ -698,9 +851,9 @@ def step_3_variable_mapping():
     with col2:
         st.subheader("Excel Columns")
         for col in validation['available_cols']:
-            if col in st.session_state.template_variables:
+            if col in template_vars:
                 st.success(f"✅ `{col}` - Used in template")
-            elif col.lower() in ['email', 'to', 'cc', 'bcc', 'from', 'subject']:
+            elif col.lower() in EMAIL_FIELD_COLUMNS:
                 st.info(f"📧 `{col}` - Email field")
             elif col in st.session_state.conditional_lines:
                 st.info(f"🔀 `{col}` - Conditional flag")
@@ -772,27 +925,28 @@ def step_4_attachments():
                 help="Enter the path to the folder containing your attachment files"
             )
             
-            if attachments_path and Path(attachments_path).exists():
+            # A single stat answers "does it exist" and keys the cached listing,
+            # so retyping the path only rescans when the folder has changed
+            try:
+                attachments_mtime = os.stat(attachments_path).st_mtime if attachments_path else None
+            except OSError:
+                attachments_mtime = None
+            
+            if attachments_mtime is not None:
                 st.session_state.attachments_dir = Path(attachments_path)
                 
                 # List files in directory
-                files = list(st.session_state.attachments_dir.glob("*"))
-                files = [f for f in files if f.is_file()]
+                file_info = build_attachments_table(str(st.session_state.attachments_dir), attachments_mtime)
                 
-                if files:
-                    st.success(f"✅ Found {len(files)} files")
+                if not file_info.empty:
+                    st.success(f"✅ Found {len(file_info)} files")
                     
                     # Show file list
-                    file_info = []
-                    for file_path in files:
-                        size_mb = file_path.stat().st_size / (1024 * 1024)
-                        file_info.append({
-                            'Filename': file_path.name,
-                            'Size (MB)': f"{size_mb:.2f}",
-                            'Type': file_path.suffix
-                        })
-                    
-                    st.dataframe(pd.DataFrame(file_info), use_container_width=True)
+                    st.dataframe(
+                        file_info,
+                        use_container_width=True,
+                        column_config={'Size (MB)': st.column_config.NumberColumn(format="%.2f")}
+                    )
                 else:
                     st.warning("⚠️ No files found in directory")
             elif attachments_path:
@@ -817,11 +971,26 @@ def step_4_attachments():
             )
             
             if uploaded_attachments and st.session_state.attachments_dir:
-                for uploaded_file in uploaded_attachments:
-                    file_path = st.session_state.attachments_dir / uploaded_file.name
-                    with open(file_path, 'wb') as f:
-                        f.write(uploaded_file.read())
-                    st.success(f"Saved: {uploaded_file.name}")
+                # The uploader keeps its files across reruns, so only write
+                # the ones not yet saved to this folder, streaming in 1 MB chunks
+                saved_uploads = st.session_state.setdefault('saved_attachment_uploads', set())
+                written, skipped = [], []
+                with st.spinner("Saving attachments..."):
+                    for uploaded_file in uploaded_attachments:
+                        upload_key = (str(st.session_state.attachments_dir), uploaded_file.file_id)
+                        if upload_key in saved_uploads:
+                            skipped.append(uploaded_file.name)
+                            continue
+                        file_path = st.session_state.attachments_dir / uploaded_file.name
+                        uploaded_file.seek(0)
+                        with open(file_path, 'wb') as f:
+                            shutil.copyfileobj(uploaded_file, f, length=1024 * 1024)
+                        saved_uploads.add(upload_key)
+                        written.append(uploaded_file.name)
+                if written:
+                    st.success(f"Saved: {', '.join(written)}")
+                if skipped:
+                    st.info(f"Already saved: {', '.join(skipped)}")
     
     else:
         # Per-recipient attachments mode
@@ -870,107 +1039,104 @@ def step_4_attachments():
             
             available_columns = st.session_state.excel_data.columns.tolist()
             
-            # Suggest common identifier columns
-            suggested_columns = ['FirstName', 'LastName', 'Email', 'Name', 'ID', 'CustomerID']
-            suggested_available = [col for col in suggested_columns if col in available_columns]
+            # Suggest common identifier columns, worked out once per set of Excel columns
+            columns_sig = tuple(available_columns)
+            if st.session_state.get('_excel_columns_sig') != columns_sig:
+                st.session_state._excel_columns_sig = columns_sig
+                st.session_state._default_identifier_idx = next(
+                    (available_columns.index(col) for col in SUGGESTED_IDENTIFIER_COLUMNS if col in available_columns), 0
+                )
             
             identifier_column = st.selectbox(
                 "Select the Excel column to use as folder names:",
                 options=available_columns,
-                index=available_columns.index(st.session_state.attachment_identifier_column) if st.session_state.attachment_identifier_column in available_columns else (available_columns.index(suggested_available[0]) if suggested_available else 0),
+                index=available_columns.index(st.session_state.attachment_identifier_column) if st.session_state.attachment_identifier_column in available_columns else st.session_state._default_identifier_idx,
                 help="This column's values will be used as subfolder names for each recipient"
             )
             
             if identifier_column != st.session_state.attachment_identifier_column:
                 st.session_state.attachment_identifier_column = identifier_column
+                st.session_state.show_folder_mapping = False
                 st.rerun()
             
             # Show folder mapping preview
             if st.session_state.attachment_identifier_column:
                 st.subheader("Folder Mapping Preview")
                 
-                # Create folder mapping
-                folder_mapping = []
-                for idx, row in st.session_state.excel_data.iterrows():
-                    identifier_value = str(row[st.session_state.attachment_identifier_column])
-                    # Clean identifier for folder name (remove special characters)
-                    clean_identifier = re.sub(r'[^\w\s-]', '', identifier_value).strip()
-                    if clean_identifier:
-                        folder_path = st.session_state.per_recipient_attachments_base / clean_identifier
+                # The mapping scans every recipient folder, so it is only built
+                # on request (and again after the identifier column changes)
+                if st.button("🔍 Preview folder mapping"):
+                    st.session_state.show_folder_mapping = True
+                
+                if st.session_state.show_folder_mapping:
+                    # Build (or reuse) the folder mapping; the base directory mtime
+                    # invalidates it when recipient folders are added or removed
+                    base_path = st.session_state.per_recipient_attachments_base
+                    folder_mapping = build_folder_mapping(
+                        st.session_state.excel_data,
+                        str(base_path),
+                        st.session_state.attachment_identifier_column,
+                        _dir_mtime(base_path)
+                    )
+                    
+                    # Display mapping table
+                    if not folder_mapping.empty:
+                        exists_mask = folder_mapping['Exists'] == '✅'
                         
-                        # Check folder existence and count files
-                        exists = folder_path.exists()
-                        file_count = 0
-                        total_size_mb = 0
-                        files_list = []
+                        # Summary statistics
+                        col1, col2, col3, col4 = st.columns(4)
+                        with col1:
+                            total_recipients = len(folder_mapping)
+                            st.metric("Total Recipients", total_recipients)
+                        with col2:
+                            folders_exist = int(exists_mask.sum())
+                            st.metric("Folders Found", f"{folders_exist}/{total_recipients}")
+                        with col3:
+                            total_files = int(folder_mapping['Files'].sum())
+                            st.metric("Total Files", total_files)
+                        with col4:
+                            total_size = folder_mapping['Size (MB)'].sum()
+                            st.metric("Total Size", f"{total_size:.2f} MB")
                         
-                        if exists:
-                            files = [f for f in folder_path.glob("*") if f.is_file()]
-                            file_count = len(files)
-                            total_size_mb = sum(f.stat().st_size for f in files) / (1024 * 1024)
-                            files_list = [f.name for f in files[:5]]  # Show first 5 files
+                        # Show detailed mapping
+                        st.dataframe(
+                            folder_mapping,
+                            use_container_width=True,
+                            height=400,
+                            column_config={'Size (MB)': st.column_config.NumberColumn(format="%.2f")}
+                        )
                         
-                        folder_mapping.append({
-                            'Recipient': row.get('Email', row.get('email', f'Row {idx+1}')),
-                            'Identifier': identifier_value,
-                            'Folder': clean_identifier,
-                            'Path': str(folder_path),
-                            'Exists': '✅' if exists else '❌',
-                            'Files': file_count,
-                            'Size (MB)': f"{total_size_mb:.2f}" if exists else "0",
-                            'Sample Files': ', '.join(files_list[:3]) + ('...' if len(files_list) > 3 else '') if files_list else 'None'
-                        })
-                
-                # Display mapping table
-                if folder_mapping:
-                    df_mapping = pd.DataFrame(folder_mapping)
-                    
-                    # Summary statistics
-                    col1, col2, col3, col4 = st.columns(4)
-                    with col1:
-                        total_recipients = len(folder_mapping)
-                        st.metric("Total Recipients", total_recipients)
-                    with col2:
-                        folders_exist = sum(1 for m in folder_mapping if m['Exists'] == '✅')
-                        st.metric("Folders Found", f"{folders_exist}/{total_recipients}")
-                    with col3:
-                        total_files = sum(m['Files'] for m in folder_mapping)
-                        st.metric("Total Files", total_files)
-                    with col4:
-                        total_size = sum(float(m['Size (MB)']) for m in folder_mapping)
-                        st.metric("Total Size", f"{total_size:.2f} MB")
-                    
-                    # Show detailed mapping
-                    st.dataframe(df_mapping, use_container_width=True, height=400)
-                    
-                    # Warnings for missing folders
-                    missing_folders = [m for m in folder_mapping if m['Exists'] == '❌']
-                    if missing_folders:
-                        with st.expander(f"⚠️ Missing Folders ({len(missing_folders)})", expanded=True):
-                            st.warning("The following recipients don't have attachment folders:")
-                            for missing in missing_folders[:10]:
-                                st.write(f"- **{missing['Recipient']}**: Expected folder `{missing['Folder']}`")
-                            if len(missing_folders) > 10:
-                                st.write(f"... and {len(missing_folders) - 10} more")
-                            
-                            if st.button("📁 Create All Missing Folders"):
-                                created_count = 0
-                                for missing in missing_folders:
-                                    folder_path = Path(missing['Path'])
-                                    folder_path.mkdir(parents=True, exist_ok=True)
-                                    created_count += 1
-                                st.success(f"Created {created_count} folders!")
-                                st.rerun()
-                    
-                    # Large attachment warnings
-                    large_attachments = [m for m in folder_mapping if m['Files'] > 0 and float(m['Size (MB)']) > 10]
-                    if large_attachments:
-                        with st.expander(f"⚠️ Large Attachments ({len(large_attachments)})"):
-                            st.warning("The following recipients have attachments over 10 MB:")
-                            for large in large_attachments[:5]:
-                                st.write(f"- **{large['Recipient']}**: {large['Size (MB)']} MB ({large['Files']} files)")
-                            if len(large_attachments) > 5:
-                                st.write(f"... and {len(large_attachments) - 5} more")
+                        # Warnings for missing folders; only the rows actually shown
+                        # are pulled out of the mapping
+                        missing_rows = (~exists_mask).to_numpy().nonzero()[0]
+                        if len(missing_rows):
+                            with st.expander(f"⚠️ Missing Folders ({len(missing_rows)})", expanded=True):
+                                st.warning("The following recipients don't have attachment folders:")
+                                missing_head = folder_mapping.iloc[missing_rows[:10]]
+                                for recipient, folder in zip(missing_head['Recipient'], missing_head['Folder']):
+                                    st.write(f"- **{recipient}**: Expected folder `{folder}`")
+                                if len(missing_rows) > 10:
+                                    st.write(f"... and {len(missing_rows) - 10} more")
+                                
+                                if st.button("📁 Create All Missing Folders"):
+                                    created_count = 0
+                                    for path in folder_mapping['Path'].iloc[missing_rows]:
+                                        Path(path).mkdir(parents=True, exist_ok=True)
+                                        created_count += 1
+                                    build_folder_mapping.clear()
+                                    st.success(f"Created {created_count} folders!")
+                                    st.rerun()
+                        
+                        # Large attachment warnings
+                        large_rows = ((folder_mapping['Files'] > 0) & (folder_mapping['Size (MB)'] > 10)).to_numpy().nonzero()[0]
+                        if len(large_rows):
+                            with st.expander(f"⚠️ Large Attachments ({len(large_rows)})"):
+                                st.warning("The following recipients have attachments over 10 MB:")
+                                large_head = folder_mapping.iloc[large_rows[:5]]
+                                for recipient, size_mb, file_count in zip(large_head['Recipient'], large_head['Size (MB)'], large_head['Files']):
+                                    st.write(f"- **{recipient}**: {size_mb:.2f} MB ({file_count} files)")
+                                if len(large_rows) > 5:
+                                    st.write(f"... and {len(large_rows) - 5} more")
     
     # Individual attachments info (legacy)
     st.divider()
@@ -1006,21 +1172,24 @@ def step_5_conditional_content():
     
     # Load existing conditional lines
     try:
-        with open('conditional_lines.json', 'r', encoding='utf-8') as f:
-            default_conditional = json.load(f)
+        conditional_mtime = os.path.getmtime('conditional_lines.json')
+        default_conditional = load_conditional_lines('conditional_lines.json', conditional_mtime)
+        default_json = conditional_lines_text('conditional_lines.json', conditional_mtime)
     except:
         default_conditional = st.session_state.conditional_lines
+        default_json = json.dumps(default_conditional, indent=2, ensure_ascii=False)
     
     # JSON input
     conditional_json = st.text_area(
         "Conditional Lines (JSON format)",
-        value=json.dumps(default_conditional, indent=2),
+        value=default_json,
         height=200,
         help="Define key-value pairs where the key matches an Excel column and the value is the text to include"
     )
     
     try:
-        conditional_data = json.loads(conditional_json)
+        # Unedited text is what was just loaded, so skip re-parsing it
+        conditional_data = default_conditional if conditional_json == default_json else json.loads(conditional_json)
         st.session_state.conditional_lines = conditional_data
         
         # Show preview of conditional rules
@@ -1056,8 +1225,7 @@ def step_5_conditional_content():
     col1, col2, col3 = st.columns([1, 1, 1])
     with col2:
         if st.button("💾 Save Conditional Rules"):
-            with open('conditional_lines.json', 'w', encoding='utf-8') as f:
-                json.dump(st.session_state.conditional_lines, f, indent=2)
+            save_conditional_lines('conditional_lines.json', st.session_state.conditional_lines)
             st.success("Conditional rules saved!")
     
     # Navigation
@@ -1072,22 +1240,20 @@ def step_5_conditional_content():
             st.session_state.current_step = 6
             st.rerun()
 
-def step_6_preview_generate():
-    st.header("6. Preview & Generate Emails")
-    st.markdown("Preview your emails and generate Outlook drafts")
-    
-    if st.session_state.excel_data is None:
-        st.error("Please upload Excel data first")
-        return
-    
-    # Email preview
+@st.fragment
+def render_email_preview():
+    """Single-recipient preview; runs as a fragment so switching rows only reruns this block"""
     st.subheader("Email Preview")
     
-    # Select row for preview
+    # Select row for preview; labels come from one column pulled as a list
+    # rather than boxing every row into a Series inside format_func
+    excel_data = st.session_state.excel_data
+    label_column = find_column(excel_data, ('FirstName', 'Email'))
+    row_labels = excel_data[label_column].tolist() if label_column else [f'Row {x+1}' for x in range(len(excel_data))]
     preview_row_idx = st.selectbox(
         "Select row to preview:",
-        range(len(st.session_state.excel_data)),
-        format_func=lambda x: f"Row {x+1}: {st.session_state.excel_data.iloc[x].get('FirstName', st.session_state.excel_data.iloc[x].get('Email', f'Row {x+1}'))}"
+        range(len(excel_data)),
+        format_func=lambda x: f"Row {x+1}: {row_labels[x]}"
     )
     
     if preview_row_idx is not None:
@@ -1101,10 +1267,9 @@ def step_6_preview_generate():
             is_html_mode = st.session_state.template_mode == "rich"
             preview_text = create_preview_email(
                 row, 
-                st.session_state.template_text, 
+                get_preview_template(st.session_state.template_text, is_html_mode), 
                 st.session_state.template_variables,
-                st.session_state.conditional_lines,
-                is_html=is_html_mode
+                st.session_state.conditional_lines
             )
             
             st.markdown("**Email Preview:**")
@@ -1151,19 +1316,21 @@ def step_6_preview_generate():
             # Attachments info
             st.write("**Attachments:**")
             attachments_to_add = []
+            # Global folder listing, shared by global mode and the per-recipient fallback
+            attachments_dir = st.session_state.attachments_dir
+            global_files = list_directory_files(str(attachments_dir), _dir_mtime(attachments_dir)) if attachments_dir else []
             
             if st.session_state.attachment_mode == "global":
                 # Global attachments mode
-                if st.session_state.attachments_dir:
-                    files = list(st.session_state.attachments_dir.glob("*"))
-                    files = [f for f in files if f.is_file()]
-                    attachments_to_add = files
+                if attachments_dir:
+                    files = global_files
+                    attachments_to_add = [attachments_dir / name for name, _ in files]
                     st.write(f"  • {len(files)} global files")
                     if files:
                         with st.expander("View attachments"):
-                            for f in files[:10]:
-                                size_mb = f.stat().st_size / (1024 * 1024)
-                                st.write(f"  - {f.name} ({size_mb:.2f} MB)")
+                            for name, size in files[:10]:
+                                size_mb = size / (1024 * 1024)
+                                st.write(f"  - {name} ({size_mb:.2f} MB)")
                             if len(files) > 10:
                                 st.write(f"  ... and {len(files) - 10} more")
                 else:
@@ -1173,20 +1340,23 @@ def step_6_preview_generate():
                 if st.session_state.per_recipient_attachments_base and st.session_state.attachment_identifier_column:
                     identifier_value = str(row.get(st.session_state.attachment_identifier_column, "")).strip()
                     if identifier_value:
-                        clean_identifier = re.sub(r'[^\w\s-]', '', identifier_value).strip()
+                        clean_identifier = _FOLDER_UNSAFE_RE.sub('', identifier_value).strip()
                         if clean_identifier:
                             recipient_folder = st.session_state.per_recipient_attachments_base / clean_identifier
-                            if recipient_folder.exists():
-                                files = [f for f in recipient_folder.glob("*") if f.is_file()]
-                                attachments_to_add = files
+                            try:
+                                files = _scan_files(recipient_folder)
+                            except OSError:
+                                files = None
+                            if files is not None:
+                                attachments_to_add = [recipient_folder / name for name, _ in files]
                                 st.write(f"  • {len(files)} files from {clean_identifier}/")
                                 if files:
                                     with st.expander("View attachments"):
                                         total_size_mb = 0
-                                        for f in files[:10]:
-                                            size_mb = f.stat().st_size / (1024 * 1024)
+                                        for name, size in files[:10]:
+                                            size_mb = size / (1024 * 1024)
                                             total_size_mb += size_mb
-                                            st.write(f"  - {f.name} ({size_mb:.2f} MB)")
+                                            st.write(f"  - {name} ({size_mb:.2f} MB)")
                                         if len(files) > 10:
                                             st.write(f"  ... and {len(files) - 10} more")
                                         st.write(f"  **Total: {total_size_mb:.2f} MB**")
@@ -1195,15 +1365,45 @@ def step_6_preview_generate():
                             else:
                                 st.warning(f"  • Folder not found: {clean_identifier}/")
                                 # Check if global fallback exists
-                                if st.session_state.attachments_dir:
-                                    files = list(st.session_state.attachments_dir.glob("*"))
-                                    files = [f for f in files if f.is_file()]
-                                    if files:
-                                        st.info(f"  • Will use {len(files)} global files as fallback")
+                                if global_files:
+                                    st.info(f"  • Will use {len(global_files)} global files as fallback")
                         else:
                             st.warning("  • Invalid folder identifier")
                 else:
                     st.warning("  • Per-recipient mode not configured")
+
+def step_6_preview_generate():
+    st.header("6. Preview & Generate Emails")
+    st.markdown("Preview your emails and generate Outlook drafts")
+    
+    if st.session_state.excel_data is None:
+        st.error("Please upload Excel data first")
+        return
+    
+    # Email preview
+    render_email_preview()
+    
+    # Overview of every recipient, generated in one batch when requested
+    if st.checkbox("Show preview table for all recipients", key="show_all_previews"):
+        df = st.session_state.excel_data
+        is_html_mode = st.session_state.template_mode == "rich"
+        bodies = create_preview_emails(
+            df,
+            st.session_state.template_text,
+            st.session_state.template_variables,
+            st.session_state.conditional_lines,
+            is_html=is_html_mode
+        )
+        if is_html_mode:
+            bodies = [convert_html_to_plain(body) for body in bodies]
+        
+        email_column = find_column(df, EMAIL_COLUMN_ALIASES)
+        preview_table = pd.DataFrame({
+            'Recipient': df[email_column].tolist() if email_column else 'No email',
+            'Subject': df['Subject'].fillna('No Subject').tolist() if 'Subject' in df.columns else 'No Subject',
+            'Body': bodies
+        })
+        st.dataframe(preview_table, use_container_width=True, height=400)
     
     # Generation settings
     st.subheader("Generation Settings")
@@ -1230,14 +1430,12 @@ def step_6_preview_generate():
         )
     
     with col2:
-        # Check Outlook availability
-        try:
-            import win32com.client
+        # Check Outlook availability (probed once when the generator is imported)
+        outlook_available = efg.OUTLOOK_AVAILABLE
+        if outlook_available:
             st.success("✅ Outlook integration available")
-            outlook_available = True
-        except ImportError:
+        else:
             st.warning("⚠️ Outlook integration not available - will create .eml files instead")
-            outlook_available = False
     
     # Generate emails
     st.divider()
@@ -1253,23 +1451,15 @@ def step_6_preview_generate():
         results_container = st.container()
         
         try:
-            # Prepare parameters
+            # Prepare parameters; the template and data are handed over in
+            # memory, only the conditional rules are persisted for step 5
             if st.session_state.template_mode == "rich":
-                # Save as HTML template for rich text mode
-                template_path = st.session_state.output_dir / "temp_template.html"
-                with open(template_path, 'w', encoding='utf-8') as f:
-                    f.write(st.session_state.template_html)
+                # Use the HTML template for rich text mode
+                template_text = st.session_state.template_html
             else:
-                template_path = st.session_state.output_dir / "temp_template.txt"
-                with open(template_path, 'w', encoding='utf-8') as f:
-                    f.write(st.session_state.template_text)
-            
-            excel_path = st.session_state.output_dir / "temp_data.xlsx"
-            st.session_state.excel_data.to_excel(excel_path, index=False)
+                template_text = st.session_state.template_text
             
-            conditionals_path = "conditional_lines.json"
-            with open(conditionals_path, 'w', encoding='utf-8') as f:
-                json.dump(st.session_state.conditional_lines, f, indent=2)
+            save_conditional_lines("conditional_lines.json", st.session_state.conditional_lines)
             
             # Call the main function from email_file_generator
             status_text.text("Generating emails...")
@@ -1284,12 +1474,12 @@ def step_6_preview_generate():
                 per_recipient_base = None
                 identifier_column = None
             
-            result = efg.main(
-                template_path=str(template_path),
-                excel_path=str(excel_path),
+            result = efg.main_from_df(
+                st.session_state.excel_data,
+                template_text,
+                st.session_state.conditional_lines,
                 attachments_dir=attachments_dir,
                 output_dir=str(st.session_state.output_dir),
-                conditionals_path=conditionals_path,
                 use_outlook=use_outlook and outlook_available,
                 create_eml_backup=create_eml_backup,
                 is_html_template=(st.session_state.template_mode == "rich"),
@@ -1367,12 +1557,6 @@ Windows with Outlook installed to create them.
 
                     if create_eml_backup:
                         st.info(f"📄 Draft .eml files saved to: {st.session_state.output_dir}")
-            
-            # Cleanup temp files
-            if template_path.exists():
-                template_path.unlink()
-            if excel_path.exists():
-                excel_path.unlink()
                 
         except Exception as e:
             progress_bar.progress(0)
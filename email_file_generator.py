@@ -1,22 +1,120 @@
 import os
 import re
+import functools
+import html
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 import mimetypes
 import zipfile
 from datetime import datetime
+from email.generator import BytesGenerator
 from email.message import EmailMessage
 import pandas as pd
 import json
+
+# Per-row and per-file progress goes through this logger so it costs nothing
+# unless a handler is configured (the __main__ block enables INFO); run-level
+# messages are still printed
+logger = logging.getLogger(__name__)
+
 try:
     import win32com.client
     OUTLOOK_AVAILABLE = True
 except ImportError:
     OUTLOOK_AVAILABLE = False
-    print("Warning: win32com not available. Install with: pip install pywin32")
+    # Logged rather than printed: every spawned .eml worker re-imports this
+    # module. Runs that ask for Outlook print their own fallback notice.
+    logger.info("win32com not available. Install with: pip install pywin32")
+
+# Prefer the Rust-backed calamine reader for Excel files when installed
+try:
+    import python_calamine  # noqa: F401
+    EXCEL_ENGINE = "calamine"
+except ImportError:
+    EXCEL_ENGINE = None  # pandas default (openpyxl)
+
+# Patterns used per row, compiled once at import
+_VAR_RE = re.compile(r"\[([^\]]+)\]")
+_COND_RE = re.compile(r"\[Conditional:([^\]]+)\]")
+_BOLD_RE = re.compile(r'\*\*(.*?)\*\*')
+_ITALIC_RE = re.compile(r'\*(.*?)\*')
+_UNDERLINE_RE = re.compile(r'__(.*?)__')
+_TRAILING_EQ_RE = re.compile(r'=(?=\s|$)')
+_HTML_TAG_RE = re.compile(r'<[^>]+>')
+_FOLDER_UNSAFE_RE = re.compile(r'[^\w\s-]')
+
+# Fixed envelope convert_to_html_email() wraps around every plain-text body
+_HTML_PREFIX = """<html>
+<head>
+<meta charset="UTF-8">
+</head>
+<body style="font-family: Arial, sans-serif; font-size: 11pt;">
+"""
+_HTML_SUFFIX = """
+</body>
+</html>"""
+
+# Output files are written through a buffer this large, so a multi-megabyte
+# .eml or ZIP bundle takes a handful of write calls instead of one per 8 KB
+WRITE_BUFFER_SIZE = 1024 * 1024
+
+# How many levels of [Conditional:...] tags inside conditional lines are expanded
+CONDITIONAL_MAX_DEPTH = 3
+
+# .eml-only runs with at least this many rows are spread across worker
+# processes; below it the pool start-up (spawned workers re-import pandas)
+# costs more than it saves
+PARALLEL_MIN_ROWS = 500
+
+# sanitize_filename: characters Windows forbids in filenames become '_' and
+# control characters are dropped, all in one str.translate pass
+_FILENAME_TABLE = str.maketrans(
+    {**{c: '_' for c in '<>:"/\\|?*'}, **{chr(c): None for c in range(32)}}
+)
+
+# Common quoted-printable encoded characters, keyed by their hex code
+_QP_CHARS = {
+    '20': ' ',    # space
+    '3D': '=',    # equals sign
+    '0A': '\n',   # newline
+    '0D': '\r',   # carriage return
+    '22': '"',    # double quote
+    '27': "'",    # single quote
+    '2C': ',',    # comma
+    '3B': ';',    # semicolon
+    '3A': ':',    # colon
+    '2E': '.',    # period
+    '2D': '-',    # hyphen
+    '5F': '_',    # underscore
+    '40': '@',    # at symbol
+    '24': '$',    # dollar sign
+    '25': '%',    # percent sign
+    '26': '&',    # ampersand
+    '2B': '+',    # plus sign
+    '3C': '<',    # less than
+    '3E': '>',    # greater than
+    '3F': '?',    # question mark
+    '21': '!',    # exclamation mark
+    '28': '(',    # left parenthesis
+    '29': ')',    # right parenthesis
+    '5B': '[',    # left bracket
+    '5D': ']',    # right bracket
+    '7B': '{',    # left brace
+    '7D': '}',    # right brace
+    '7C': '|',    # pipe
+    '5C': '\\',   # backslash
+    '2F': '/',    # forward slash
+    '7E': '~',    # tilde
+}
+# Only the codes above are matched, so other =XX sequences (left as they
+# are) never reach the replacement callback
+_QP_ESCAPE_RE = re.compile('=(' + '|'.join(_QP_CHARS) + ')')
 
 
 def extract_variables(template_text):
     """Return a list of variables like ['FirstName', 'Company'] found in the template."""
-    return re.findall(r"\[([^\]]+)\]", template_text)
+    return _VAR_RE.findall(template_text)
 
 
 def apply_text_formatting(text):
@@ -24,13 +122,20 @@ def apply_text_formatting(text):
     if not text:
         return text
     
-    # Convert markdown-style formatting to HTML
-    # **text** -> <b>text</b> (bold)
-    text = re.sub(r'\*\*(.*?)\*\*', r'<b>\1</b>', text)
-    # *text* -> <i>text</i> (italic)
-    text = re.sub(r'\*(.*?)\*', r'<i>\1</i>', text)
-    # __text__ -> <u>text</u> (underline)
-    text = re.sub(r'__(.*?)__', r'<u>\1</u>', text)
+    # Convert markdown-style formatting to HTML, skipping passes whose
+    # marker doesn't occur at all (most bodies have no formatting).
+    # The passes must stay separate and in this order: a single alternation
+    # would pick the leftmost marker instead of bold first, so a bullet like
+    # "* item **key**" would come out in italics.
+    if '**' in text:
+        # **text** -> <b>text</b> (bold)
+        text = _BOLD_RE.sub(r'<b>\1</b>', text)
+    if '*' in text:
+        # *text* -> <i>text</i> (italic)
+        text = _ITALIC_RE.sub(r'<i>\1</i>', text)
+    if '__' in text:
+        # __text__ -> <u>text</u> (underline)
+        text = _UNDERLINE_RE.sub(r'<u>\1</u>', text)
     
     return text
 
@@ -43,91 +148,178 @@ def convert_to_html_email(text):
     # Apply text formatting first
     text = apply_text_formatting(text)
     
-    # Convert line breaks to HTML
-    text = text.replace('\n', '<br>')
-    
-    # Wrap in basic HTML structure
-    html_body = f"""<html>
-<head>
-<meta charset="UTF-8">
-</head>
-<body style="font-family: Arial, sans-serif; font-size: 11pt;">
-{text}
-</body>
-</html>"""
-    
-    return html_body
+    # Convert line breaks to HTML and wrap in basic HTML structure
+    return ''.join((_HTML_PREFIX, text.replace('\n', '<br>'), _HTML_SUFFIX))
+
+
+def _decode_qp_escape(match):
+    """Replacement for one _QP_ESCAPE_RE match."""
+    return _QP_CHARS[match.group(1)]
 
 
 def clean_email_encoding(text):
     """Clean up email encoding artifacts like quoted-printable characters."""
-    if not text:
+    # Every artifact handled below starts with '=', so most values (names,
+    # companies, plain sentences) can be returned untouched
+    if not text or '=' not in text:
         return text
     
     # Remove quoted-printable encoding artifacts
     text = text.replace('=\n', '')  # Remove soft line breaks
-    text = text.replace('=\r\n', '')  # Remove soft line breaks (Windows)
-    text = text.replace('=\r', '')  # Remove soft line breaks (Mac)
-    
-    # Common quoted-printable encoded characters
-    replacements = {
-        '=20': ' ',    # space
-        '=3D': '=',    # equals sign
-        '=0A': '\n',   # newline
-        '=0D': '\r',   # carriage return
-        '=22': '"',    # double quote
-        '=27': "'",    # single quote
-        '=2C': ',',    # comma
-        '=3B': ';',    # semicolon
-        '=3A': ':',    # colon
-        '=2E': '.',    # period
-        '=2D': '-',    # hyphen
-        '=5F': '_',    # underscore
-        '=40': '@',    # at symbol
-        '=24': '$',    # dollar sign
-        '=25': '%',    # percent sign
-        '=26': '&',    # ampersand
-        '=2B': '+',    # plus sign
-        '=3C': '<',    # less than
-        '=3E': '>',    # greater than
-        '=3F': '?',    # question mark
-        '=21': '!',    # exclamation mark
-        '=28': '(',    # left parenthesis
-        '=29': ')',    # right parenthesis
-        '=5B': '[',    # left bracket
-        '=5D': ']',    # right bracket
-        '=7B': '{',    # left brace
-        '=7D': '}',    # right brace
-        '=7C': '|',    # pipe
-        '=5C': '\\',   # backslash
-        '=2F': '/',    # forward slash
-        '=7E': '~',    # tilde
-    }
+    if '\r' in text:
+        text = text.replace('=\r\n', '')  # Remove soft line breaks (Windows)
+        text = text.replace('=\r', '')  # Remove soft line breaks (Mac)
     
-    for encoded, decoded in replacements.items():
-        text = text.replace(encoded, decoded)
+    # Decode common quoted-printable characters in one scan
+    text = _QP_ESCAPE_RE.sub(_decode_qp_escape, text)
     
     # Remove any remaining stray = characters that might be encoding artifacts
     # But be careful not to remove legitimate = signs in content
     # Only remove = that appear at line breaks or followed by unusual characters
-    text = re.sub(r'=(?=\s|$)', '', text)  # Remove = at end of lines or before whitespace
+    text = _TRAILING_EQ_RE.sub('', text)  # Remove = at end of lines or before whitespace
     
     return text
 
 
-def fill_template(template_text, row, variables):
-    """Fill template placeholders with row values, leaving placeholders if missing."""
-    result = template_text
-    for var in variables:
-        if var in row and pd.notna(row[var]):
-            value = str(row[var])
+@functools.lru_cache(maxsize=256)
+def compile_template(template_text, variables):
+    """Specialize a template for a fixed set of variables.
+
+    Returns a tuple of (literal, variable) pairs: each literal fragment is
+    followed by the variable to substitute after it (None after the last one).
+    Placeholders that aren't in variables are folded into the literal text,
+    so filling a row only visits the values it actually needs.
+    """
+    tokens = _VAR_RE.split(template_text)
+    plan = []
+    literal = tokens[0]
+    for i in range(1, len(tokens), 2):
+        name = tokens[i]
+        if name in variables:
+            plan.append((literal, name))
+            literal = tokens[i + 1]
+        else:
+            literal += f"[{name}]" + tokens[i + 1]
+    plan.append((literal, None))
+    return tuple(plan)
+
+
+@functools.lru_cache(maxsize=256)
+def clean_static_text(text):
+    """clean_email_encoding() for text that doesn't vary per row."""
+    return clean_email_encoding(text)
+
+
+def template_values(df, variables):
+    """
+    Prepare each row's template values for fill_template() in one pass per column.
+
+    Returns:
+        list: One dict per row mapping each variable the DataFrame has a column
+        for to its cleaned string, or None where the cell is missing
+    """
+    columns = [var for var in dict.fromkeys(variables) if var in df.columns]
+    # Repeated values (companies, cities, flags) are only cleaned once
+    cleaned_text = {}
+    cleaned = []
+    for var in columns:
+        present = df[var].notna().tolist()
+        column_values = []
+        for value, ok in zip(df[var].tolist(), present):
+            if not ok:
+                column_values.append(None)
+                continue
+            text = str(value)
+            if text not in cleaned_text:
+                cleaned_text[text] = clean_email_encoding(text)
+            column_values.append(cleaned_text[text])
+        cleaned.append(column_values)
+    return [dict(zip(columns, row_values)) for row_values in zip(*cleaned)] if columns else [{} for _ in range(len(df))]
+
+
+def fill_template(template_text, row, variables, values=None):
+    """Fill template placeholders with row values, leaving placeholders if missing.
+
+    values: Optional dict for this row from template_values(), which saves
+    the per-cell missing check and cleaning.
+    """
+    plan = compile_template(template_text, frozenset(variables))
+    if len(plan) == 1:
+        # No placeholders to fill, so every row gets the same cleaned text
+        return clean_static_text(plan[0][0])
+    
+    parts = []
+    for literal, var in plan:
+        parts.append(literal)
+        if var is None:
+            continue
+        if values is not None:
+            value = values.get(var)
+        elif var in row and pd.notna(row[var]):
             # Clean encoding artifacts from the value
-            value = clean_email_encoding(value)
-            result = result.replace(f"[{var}]", value)
+            value = clean_email_encoding(str(row[var]))
+        else:
+            value = None
+        parts.append(f"[{var}]" if value is None else value)
     
-    # Clean the final result as well
-    result = clean_email_encoding(result)
-    return result
+    # Clean the final result as well: this catches artifacts in the template's
+    # own text and escapes split across a value and its surroundings. It is a
+    # single scan, and a plain '=' check when there is nothing to decode.
+    return clean_email_encoding(''.join(parts))
+
+
+# Columns tried in order for each address field; the first non-empty value wins
+ADDRESS_COLUMN_ALIASES = {
+    'to': ('Email', 'email', 'To'),
+    'cc': ('CC', 'cc'),
+    'bcc': ('BCC', 'bcc'),
+}
+
+
+def generation_columns(variables, conditional_lines, identifier_column=None):
+    """
+    Names of the columns email generation reads from a row.
+
+    Attachment columns are matched by prefix instead (see is_attachment_column).
+    """
+    columns = set(variables) | set(conditional_lines)
+    columns.update(col for aliases in ADDRESS_COLUMN_ALIASES.values() for col in aliases)
+    columns.update(('From', 'Subject', 'FirstName'))
+    if identifier_column:
+        columns.add(identifier_column)
+    return columns
+
+
+def is_attachment_column(col):
+    """Whether a column lists attachment filenames."""
+    return str(col).lower().startswith('attachment')
+
+
+def resolve_address_columns(columns):
+    """Narrow ADDRESS_COLUMN_ALIASES to the aliases present in columns (done once per run)."""
+    return {field: tuple(col for col in aliases if col in columns)
+            for field, aliases in ADDRESS_COLUMN_ALIASES.items()}
+
+
+def first_value(row, keys):
+    """Return the first non-empty row value among keys, or None."""
+    for key in keys:
+        value = row.get(key)
+        if value:
+            return value
+    return None
+
+
+def recipient_addresses(row, address_columns=None):
+    """
+    Parse a row's To/CC/BCC addresses.
+
+    Returns:
+        dict: 'to', 'cc' and 'bcc' mapped to lists of addresses
+    """
+    if address_columns is None:
+        address_columns = ADDRESS_COLUMN_ALIASES
+    return {field: parse_email_addresses(first_value(row, keys)) for field, keys in address_columns.items()}
 
 
 def parse_email_addresses(email_str):
@@ -139,16 +331,153 @@ def parse_email_addresses(email_str):
     if not email_str or pd.isna(email_str):
         return []
     
-    # Split by comma, strip whitespace, and filter out bracketed or empty emails
-    emails = [
-        email.strip() 
-        for email in str(email_str).split(',') 
-        if email.strip() and not (email.strip().startswith('[') and email.strip().endswith(']'))
-    ]
+    email_str = str(email_str)
+    # Most cells hold a single address, which needs no splitting
+    parts = email_str.split(',') if ',' in email_str else (email_str,)
+    
+    # Strip whitespace once per entry, and filter out bracketed or empty emails
+    emails = []
+    for email in parts:
+        email = email.strip()
+        if email and not (email[0] == '[' and email[-1] == ']'):
+            emails.append(email)
     return emails
 
 
-def create_email_message(row, template_text, variables, attachments_dir, attachment_columns, conditional_lines, is_html_template=False, attachment_mode="global", per_recipient_base=None, identifier_column=None):
+def list_attachment_files(directory):
+    """Return (filename, path, size_mb) for every file directly inside directory.
+
+    A missing directory has no files, so callers don't need a separate
+    existence check before listing it.
+    """
+    files = []
+    # scandir reports the entry type from the directory read itself, so only
+    # the size needs a stat call
+    try:
+        entries = os.scandir(directory)
+    except FileNotFoundError:
+        return files
+    with entries:
+        for entry in entries:
+            # Only attach files (not directories)
+            if entry.is_file():
+                files.append((entry.name, entry.path, entry.stat().st_size / (1024 * 1024)))
+    return files
+
+
+def guess_mime_type(file_path):
+    """Return the (maintype, subtype) pair to attach a file with."""
+    # guess_type only looks at the last two suffixes (an encoding such as .gz
+    # plus the type before it), so those are all the cache needs to key on
+    root, ext = os.path.splitext(os.path.basename(file_path))
+    return _mime_type_for_suffixes(os.path.splitext(root)[1] + ext)
+
+
+@functools.lru_cache(maxsize=256)
+def _mime_type_for_suffixes(suffixes):
+    """guess_mime_type() memoized per trailing suffixes, e.g. '.pdf' or '.tar.gz'."""
+    ctype, _ = mimetypes.guess_type('file' + suffixes)
+    if ctype:
+        return tuple(ctype.split('/', 1))
+    return 'application', 'octet-stream'
+
+
+def read_attachments(attachment_files):
+    """Read attachment files into (filename, data, maintype, subtype, size_mb) tuples."""
+    attachments = []
+    for filename, file_path, file_size_mb in attachment_files:
+        try:
+            with open(file_path, 'rb') as fh:
+                data = fh.read()
+        except Exception as e:
+            logger.error("  ❌ Failed to attach %s: %s", filename, e)
+            continue
+        maintype, subtype = guess_mime_type(file_path)
+        attachments.append((filename, data, maintype, subtype, file_size_mb))
+    return attachments
+
+
+def static_conditional_lines(conditional_lines, variables):
+    """
+    Pre-render the conditional lines that don't use any template variables.
+
+    Footers and disclaimers come out the same for every row, so they are
+    filled once per run instead of once per row that includes them.
+
+    Returns:
+        dict: Conditional key -> finished text, for the static lines only
+    """
+    variable_set = frozenset(variables)
+    static_lines = {}
+    for key, raw_text in conditional_lines.items():
+        if isinstance(raw_text, str) and len(compile_template(raw_text, variable_set)) == 1:
+            static_lines[key] = fill_template(raw_text, {}, variables)
+    return static_lines
+
+
+def fill_body(row, template_text, variables, conditional_lines, values=None, static_lines=None):
+    """
+    Fill a row's template and conditional lines.
+
+    values: Optional dict for this row from template_values().
+    static_lines: Optional dict from static_conditional_lines() for the same
+    conditional lines and variables.
+    """
+    # First, fill in the main template placeholders
+    body = fill_template(template_text, row, variables, values)
+
+    # Second, handle conditional placeholders, one pass over the body per level
+    if '[Conditional:' not in body:
+        return body
+
+    def replace_conditional(match):
+        placeholder_key = match.group(1)
+        # Check if the flag is set to 1 in the Excel row
+        if placeholder_key in conditional_lines and placeholder_key in row and row[placeholder_key] == 1:
+            # If so, get the text from the JSON and fill its own placeholders
+            if static_lines and placeholder_key in static_lines:
+                return static_lines[placeholder_key]
+            raw_text = conditional_lines[placeholder_key]
+            return fill_template(raw_text, row, variables, values)
+        return ""  # Default to empty string
+
+    # Included lines may carry [Conditional:...] tags of their own; those are
+    # expanded too, up to a fixed depth so a line that includes itself can't loop
+    for _ in range(CONDITIONAL_MAX_DEPTH):
+        body, count = _COND_RE.subn(replace_conditional, body)
+        if not count or '[Conditional:' not in body:
+            break
+    return body
+
+
+def fill_bodies(df, template_text, variables, conditional_lines):
+    """Fill the template and conditional lines for every row of df."""
+    values = template_values(df, variables)
+    static_lines = static_conditional_lines(conditional_lines, variables)
+    return [
+        fill_body(row, template_text, variables, conditional_lines, row_values, static_lines)
+        for row, row_values in zip(df.to_dict('records'), values)
+    ]
+
+
+def render_body(row, template_text, variables, conditional_lines, is_html_template=False, values=None, static_lines=None):
+    """
+    Fill a row's template and conditional lines and build its HTML form.
+
+    values: Optional dict for this row from template_values().
+    static_lines: Optional dict from static_conditional_lines().
+
+    Returns:
+        tuple: (body, html_body) - the filled template and its HTML form
+        (the same string when the template is already HTML)
+    """
+    body = fill_body(row, template_text, variables, conditional_lines, values, static_lines)
+    if is_html_template:
+        return body, body
+    return body, convert_to_html_email(body)
+
+
+def create_email_message(row, template_text, variables, attachments_dir, attachment_columns, conditional_lines, is_html_template=False, attachment_mode="global", per_recipient_base=None, identifier_column=None, attachment_cache=None, rendered=None, address_columns=None, html_only=False, addresses=None):
     """Create EmailMessage object for a DataFrame row as a clean email (no draft prefixes).
     
     Args:
@@ -162,16 +491,27 @@ def create_email_message(row, template_text, variables, attachments_dir, attachm
         attachment_mode: "global" or "per_recipient"
         per_recipient_base: Base folder for per-recipient attachments
         identifier_column: Column to use for per-recipient folder names
+        attachment_cache: Optional dict reused across rows so the global
+            attachments folder is only read once per run
+        rendered: Optional (body, html_body) from render_body(), so a body
+            already rendered for the Outlook draft isn't rendered again
+        address_columns: Optional result of resolve_address_columns() for
+            the DataFrame, so absent alias columns aren't looked up per row
+        html_only: Write a single text/html body instead of a plain-text part
+            with an HTML alternative
+        addresses: Optional result of recipient_addresses() for this row
     """
+    if addresses is None:
+        addresses = recipient_addresses(row, address_columns)
     msg = EmailMessage()
 
     # Handle To addresses (clean, no [DRAFT] prefix)
-    to_addresses = parse_email_addresses(row.get('Email') or row.get('email') or row.get('To'))
+    to_addresses = addresses['to']
     if to_addresses:
         msg['To'] = ', '.join(to_addresses)
     
     # Handle CC addresses (clean, no [DRAFT] prefix)
-    cc_addresses = parse_email_addresses(row.get('CC') or row.get('cc'))
+    cc_addresses = addresses['cc']
     # Add default CC address - removing the hardcoded bracket for Streamlit version
     # default_cc = '['  # Always CC this address
     # if default_cc:
@@ -180,7 +520,7 @@ def create_email_message(row, template_text, variables, attachments_dir, attachm
         msg['CC'] = ', '.join(cc_addresses)
     
     # Handle BCC addresses (clean, no [DRAFT] prefix)
-    bcc_addresses = parse_email_addresses(row.get('BCC') or row.get('bcc'))
+    bcc_addresses = addresses['bcc']
     if bcc_addresses:
         msg['BCC'] = ', '.join(bcc_addresses)
     
@@ -192,36 +532,25 @@ def create_email_message(row, template_text, variables, attachments_dir, attachm
     msg['X-Unsent'] = '1'
     msg['X-Draft-Info'] = 'Generated email - Review before sending'
 
-    # First, fill in the main template placeholders
-    body = fill_template(template_text, row, variables)
-
-    # Second, handle conditional placeholders
-    conditional_placeholders = re.findall(r"\[Conditional:([^\]]+)\]", body)
-    for placeholder_key in conditional_placeholders:
-        placeholder_tag = f"[Conditional:{placeholder_key}]"
-        replacement_text = "" # Default to empty string
-        # Check if the flag is set to 1 in the Excel row
-        if placeholder_key in conditional_lines and placeholder_key in row and row[placeholder_key] == 1:
-            # If so, get the text from the JSON and fill its own placeholders
-            raw_text = conditional_lines[placeholder_key]
-            replacement_text = fill_template(raw_text, row, variables)
-        
-        body = body.replace(placeholder_tag, replacement_text)
+    if rendered is None:
+        rendered = render_body(row, template_text, variables, conditional_lines, is_html_template)
+    body, html_body = rendered
 
     # Set clean email body without draft notices
     # Support both plain text and HTML
-    if is_html_template:
+    if html_only:
+        # One HTML part, no multipart/alternative wrapper
+        msg.set_content(html_body, subtype='html')
+    elif is_html_template:
         # Template is already HTML, use it directly
         # Create a plain text version from HTML
-        plain_text = re.sub(r'<[^>]+>', '', body)  # Simple HTML tag removal
-        plain_text = plain_text.replace('&nbsp;', ' ').replace('&lt;', '<').replace('&gt;', '>').replace('&amp;', '&')
-        plain_text = plain_text.replace('&quot;', '"').replace('&#39;', "'")  # Additional entity replacements
+        plain_text = _HTML_TAG_RE.sub('', body)  # Simple HTML tag removal
+        # Decode every named and numeric entity in one pass (&nbsp; stays a plain space)
+        plain_text = html.unescape(plain_text.replace('&nbsp;', ' '))
         # Set plain text first, then add HTML alternative
         msg.set_content(plain_text)
         msg.add_alternative(body, subtype='html')
     else:
-        # Convert plain text to HTML
-        html_body = convert_to_html_email(body)
         msg.set_content(body)  # Plain text version
         msg.add_alternative(html_body, subtype='html')  # HTML version
 
@@ -234,48 +563,58 @@ def create_email_message(row, template_text, variables, attachments_dir, attachm
         identifier_value = str(row.get(identifier_column, "")).strip()
         if identifier_value:
             # Clean identifier for folder name (remove special characters)
-            clean_identifier = re.sub(r'[^\w\s-]', '', identifier_value).strip()
+            clean_identifier = _FOLDER_UNSAFE_RE.sub('', identifier_value).strip()
             if clean_identifier:
                 per_recipient_dir = os.path.join(per_recipient_base, clean_identifier)
                 if os.path.exists(per_recipient_dir):
                     actual_attachments_dir = per_recipient_dir
                     attachment_source = f"per-recipient ({clean_identifier})"
-                    print(f"  📁 Using per-recipient folder: {clean_identifier}")
+                    logger.info("  📁 Using per-recipient folder: %s", clean_identifier)
                 else:
-                    print(f"  ⚠️ Per-recipient folder not found: {clean_identifier}, falling back to global attachments")
+                    logger.warning("  ⚠️ Per-recipient folder not found: %s, falling back to global attachments", clean_identifier)
     
     # Attach files from the determined directory
     total_size_mb = 0
     attached_files = []
     
-    if actual_attachments_dir and os.path.exists(actual_attachments_dir):
-        for filename in os.listdir(actual_attachments_dir):
-            file_path = os.path.join(actual_attachments_dir, filename)
-            # Only attach files (not directories)
-            if os.path.isfile(file_path):
-                try:
-                    file_size_mb = os.path.getsize(file_path) / (1024 * 1024)
-                    
-                    # Warn about large files
-                    if file_size_mb > 10:
-                        print(f"  ⚠️ Large attachment: {filename} ({file_size_mb:.2f} MB)")
-                    
-                    with open(file_path, 'rb') as fh:
-                        data = fh.read()
-                    ctype, _ = mimetypes.guess_type(file_path)
-                    if ctype:
-                        maintype, subtype = ctype.split('/', 1)
-                    else:
-                        maintype, subtype = 'application', 'octet-stream'
-                    msg.add_attachment(data, maintype=maintype, subtype=subtype, filename=filename)
-                    attached_files.append(filename)
-                    total_size_mb += file_size_mb
-                    print(f"  ✅ Attached: {filename} ({file_size_mb:.2f} MB) from {attachment_source}")
-                except Exception as e:
-                    print(f"  ❌ Failed to attach {filename}: {e}")
+    if actual_attachments_dir:
+        if attachment_cache is not None and actual_attachments_dir == attachments_dir:
+            # The global folder is the same for every recipient, so read it once per run.
+            # Bytes are only cached here, for .eml output; the listing is shared with
+            # the Outlook path, which attaches by path and never reads the files.
+            cache_key = ('data', actual_attachments_dir)
+            if cache_key not in attachment_cache:
+                files_key = ('files', actual_attachments_dir)
+                if files_key not in attachment_cache:
+                    attachment_cache[files_key] = list_attachment_files(actual_attachments_dir)
+                attachment_cache[cache_key] = read_attachments(attachment_cache[files_key])
+            attachments = attachment_cache[cache_key]
+        elif attachment_cache is not None:
+            # Per-recipient folders: keep only the last one read, so consecutive rows
+            # for the same identifier share it without holding every folder in memory
+            recent = attachment_cache.get('recent_data')
+            if recent is None or recent[0] != actual_attachments_dir:
+                recent = (actual_attachments_dir, read_attachments(list_attachment_files(actual_attachments_dir)))
+                attachment_cache['recent_data'] = recent
+            attachments = recent[1]
+        else:
+            attachments = read_attachments(list_attachment_files(actual_attachments_dir))
+        
+        for filename, data, maintype, subtype, file_size_mb in attachments:
+            try:
+                # Warn about large files
+                if file_size_mb > 10:
+                    logger.warning("  ⚠️ Large attachment: %s (%.2f MB)", filename, file_size_mb)
+                
+                msg.add_attachment(data, maintype=maintype, subtype=subtype, filename=filename)
+                attached_files.append(filename)
+                total_size_mb += file_size_mb
+                logger.info("  ✅ Attached: %s (%.2f MB) from %s", filename, file_size_mb, attachment_source)
+            except Exception as e:
+                logger.error("  ❌ Failed to attach %s: %s", filename, e)
     
     if total_size_mb > 25:
-        print(f"  ⚠️ Warning: Total attachment size is {total_size_mb:.2f} MB - may exceed email limits")
+        logger.warning("  ⚠️ Warning: Total attachment size is %.2f MB - may exceed email limits", total_size_mb)
     
     # Legacy: Also handle attachment columns if specified (for backward compatibility)
     for col in attachment_columns:
@@ -288,24 +627,34 @@ def create_email_message(row, template_text, variables, attachments_dir, attachm
             try:
                 with open(file_path, 'rb') as fh:
                     data = fh.read()
-                ctype, _ = mimetypes.guess_type(file_path)
-                if ctype:
-                    maintype, subtype = ctype.split('/', 1)
-                else:
-                    maintype, subtype = 'application', 'octet-stream'
+                maintype, subtype = guess_mime_type(file_path)
                 msg.add_attachment(data, maintype=maintype, subtype=subtype, filename=base_filename)
                 attached_files.append(base_filename)
-                print(f"  ✅ Attached from Excel: {base_filename}")
+                logger.info("  ✅ Attached from Excel: %s", base_filename)
             except FileNotFoundError:
-                print(f"  ❌ Attachment not found: {file_path} (original: {base_filename})")
+                logger.error("  ❌ Attachment not found: %s (original: %s)", file_path, base_filename)
             except Exception as e:
-                print(f"  ❌ Failed to attach from Excel {base_filename}: {e}")
+                logger.error("  ❌ Failed to attach from Excel %s: %s", base_filename, e)
     
     # Return msg with attachment info for tracking
     return msg
 
 
-def create_outlook_draft(row, template_text, variables, attachments_dir, attachment_columns, conditional_lines, is_html_template=False, attachment_mode="global", per_recipient_base=None, identifier_column=None, output_dir="generated_emails"):
+def connect_outlook():
+    """
+    Connect to Outlook once for a whole run.
+
+    Prefers an early-bound (makepy) proxy, whose property sets and method
+    calls skip the per-call name lookups of a late-bound Dispatch; falls back
+    to plain Dispatch if the generated type library cache can't be built.
+    """
+    try:
+        return win32com.client.gencache.EnsureDispatch("Outlook.Application")
+    except Exception:
+        return win32com.client.Dispatch("Outlook.Application")
+
+
+def create_outlook_draft(row, template_text, variables, attachments_dir, attachment_columns, conditional_lines, is_html_template=False, attachment_mode="global", per_recipient_base=None, identifier_column=None, output_dir="generated_emails", attachment_cache=None, rendered=None, address_columns=None, addresses=None, outlook=None):
     """Create an actual Outlook .msg file from the row data.
     
     Args:
@@ -320,26 +669,34 @@ def create_outlook_draft(row, template_text, variables, attachments_dir, attachm
         per_recipient_base: Base folder for per-recipient attachments
         identifier_column: Column to use for per-recipient folder names
         output_dir: Directory to save .msg files
+        attachment_cache: Optional dict reused across rows so the global
+            attachments folder is only listed once per run
+        rendered: Optional (body, html_body) from render_body()
+        address_columns: Optional result of resolve_address_columns()
+        addresses: Optional result of recipient_addresses() for this row
+        outlook: Optional Outlook application from connect_outlook(); connects
+            for this row only when omitted
     """
     if not OUTLOOK_AVAILABLE:
         raise ImportError("win32com.client not available. Install with: pip install pywin32")
+    if addresses is None:
+        addresses = recipient_addresses(row, address_columns)
     
     try:
-        print("  📧 Connecting to Outlook...", end="", flush=True)
-        outlook = win32com.client.Dispatch("Outlook.Application")
-        print(" ✅")
+        if outlook is None:
+            outlook = win32com.client.Dispatch("Outlook.Application")
+            logger.debug("  📧 Connected to Outlook")
         
-        print("  📝 Creating email item...", end="", flush=True)
         mail = outlook.CreateItem(0)  # 0 = Mail item
-        print(" ✅")
+        logger.debug("  📝 Created email item")
         
         # Handle To addresses (original addresses without [DRAFT] prefix for Outlook)
-        to_addresses = parse_email_addresses(row.get('Email') or row.get('email') or row.get('To'))
+        to_addresses = addresses['to']
         if to_addresses:
             mail.To = '; '.join(to_addresses)
         
         # Handle CC addresses
-        cc_addresses = parse_email_addresses(row.get('CC') or row.get('cc'))
+        cc_addresses = addresses['cc']
         # Remove default CC bracket for Streamlit version
         # default_cc = '['  # Always CC this address
         # if default_cc:
@@ -348,7 +705,7 @@ def create_outlook_draft(row, template_text, variables, attachments_dir, attachm
             mail.CC = '; '.join(cc_addresses)
         
         # Handle BCC addresses
-        bcc_addresses = parse_email_addresses(row.get('BCC') or row.get('bcc'))
+        bcc_addresses = addresses['bcc']
         if bcc_addresses:
             mail.BCC = '; '.join(bcc_addresses)
         
@@ -358,7 +715,7 @@ def create_outlook_draft(row, template_text, variables, attachments_dir, attachm
             try:
                 mail.SentOnBehalfOfName = sender
             except Exception:
-                print(f"    ⚠️ Could not set sender to {sender}")
+                logger.warning("    ⚠️ Could not set sender to %s", sender)
         
         # Set subject (clean, no [DRAFT] prefix since this is already a draft in Outlook)
         subject = row.get('Subject') or 'No Subject'
@@ -367,31 +724,15 @@ def create_outlook_draft(row, template_text, variables, attachments_dir, attachm
         # Set email format to HTML (olFormatHTML = 2)
         mail.BodyFormat = 2
         
-        print("  📄 Processing email body...", end="", flush=True)
         # Process email body
-        body = fill_template(template_text, row, variables)
-        
-        # Handle conditional placeholders
-        conditional_placeholders = re.findall(r"\[Conditional:([^\]]+)\]", body)
-        for placeholder_key in conditional_placeholders:
-            placeholder_tag = f"[Conditional:{placeholder_key}]"
-            replacement_text = ""
-            if placeholder_key in conditional_lines and placeholder_key in row and row[placeholder_key] == 1:
-                raw_text = conditional_lines[placeholder_key]
-                replacement_text = fill_template(raw_text, row, variables)
-            body = body.replace(placeholder_tag, replacement_text)
+        if rendered is None:
+            rendered = render_body(row, template_text, variables, conditional_lines, is_html_template)
         
         # Set HTML body (setting HTMLBody automatically preserves HTML format)
-        if is_html_template:
-            # Template is already HTML
-            mail.HTMLBody = body
-        else:
-            # Convert plain text to HTML
-            mail.HTMLBody = convert_to_html_email(body)
-        print(" ✅")
+        mail.HTMLBody = rendered[1]
+        logger.debug("  📄 Processed email body")
         
         # Add attachments
-        print("  📎 Adding attachments...", end="", flush=True)
         attachment_count = 0
         attachment_debug = []
         
@@ -404,7 +745,7 @@ def create_outlook_draft(row, template_text, variables, attachments_dir, attachm
             identifier_value = str(row.get(identifier_column, "")).strip()
             if identifier_value:
                 # Clean identifier for folder name (remove special characters)
-                clean_identifier = re.sub(r'[^\w\s-]', '', identifier_value).strip()
+                clean_identifier = _FOLDER_UNSAFE_RE.sub('', identifier_value).strip()
                 if clean_identifier:
                     per_recipient_dir = os.path.join(per_recipient_base, clean_identifier)
                     if os.path.exists(per_recipient_dir):
@@ -416,25 +757,30 @@ def create_outlook_draft(row, template_text, variables, attachments_dir, attachm
         
         # Attach files from the determined directory
         total_size_mb = 0
-        if actual_attachments_dir and os.path.exists(actual_attachments_dir):
-            for filename in os.listdir(actual_attachments_dir):
-                file_path = os.path.join(actual_attachments_dir, filename)
-                # Only attach files (not directories)
-                if os.path.isfile(file_path):
-                    file_size_mb = os.path.getsize(file_path) / (1024 * 1024)
-                    attachment_debug.append(f"Trying to attach: {file_path} ({file_size_mb:.2f} MB) from {attachment_source}")
-                    
-                    # Warn about large files
-                    if file_size_mb > 10:
-                        attachment_debug.append(f"⚠️ Large attachment: {filename} ({file_size_mb:.2f} MB)")
-                    
-                    try:
-                        mail.Attachments.Add(file_path)
-                        attachment_count += 1
-                        total_size_mb += file_size_mb
-                        attachment_debug.append(f"✅ Successfully attached: {filename}")
-                    except Exception as e:
-                        attachment_debug.append(f"❌ Failed to attach {filename}: {e}")
+        if actual_attachments_dir:
+            if attachment_cache is not None and actual_attachments_dir == attachments_dir:
+                # Outlook attaches by path, so only the listing of the global folder is cached
+                cache_key = ('files', actual_attachments_dir)
+                if cache_key not in attachment_cache:
+                    attachment_cache[cache_key] = list_attachment_files(actual_attachments_dir)
+                attachment_files = attachment_cache[cache_key]
+            else:
+                attachment_files = list_attachment_files(actual_attachments_dir)
+            
+            for filename, file_path, file_size_mb in attachment_files:
+                attachment_debug.append(f"Trying to attach: {file_path} ({file_size_mb:.2f} MB) from {attachment_source}")
+                
+                # Warn about large files
+                if file_size_mb > 10:
+                    attachment_debug.append(f"⚠️ Large attachment: {filename} ({file_size_mb:.2f} MB)")
+                
+                try:
+                    mail.Attachments.Add(file_path)
+                    attachment_count += 1
+                    total_size_mb += file_size_mb
+                    attachment_debug.append(f"✅ Successfully attached: {filename}")
+                except Exception as e:
+                    attachment_debug.append(f"❌ Failed to attach {filename}: {e}")
         
         if total_size_mb > 25:
             attachment_debug.append(f"⚠️ Warning: Total attachment size is {total_size_mb:.2f} MB")
@@ -454,7 +800,7 @@ def create_outlook_draft(row, template_text, variables, attachments_dir, attachm
                 except Exception as e:
                     attachment_debug.append(f"❌ Failed to attach from Excel {base_filename}: {e}")
         
-        print(f" ✅ ({attachment_count} files)")
+        logger.info("  📎 Added attachments (%d files)", attachment_count)
         
         # Generate filename for .msg file
         recipient_name = row.get('FirstName') or row.get('Email') or row.get('email') or 'recipient'
@@ -474,12 +820,10 @@ def create_outlook_draft(row, template_text, variables, attachments_dir, attachm
         msg_path = os.path.join(output_dir, filename)
         
         # Save as .msg file (olMSG format = 3)
-        print("  💾 Saving .msg file...", end="", flush=True)
         olMSG = 3
         mail.SaveAs(msg_path, olMSG)
-        print(" ✅")
         
-        print(f"  🎯 .msg file saved: {filename}")
+        logger.info("  🎯 .msg file saved: %s", filename)
         
         # Return debug info for troubleshooting
         return {
@@ -490,7 +834,7 @@ def create_outlook_draft(row, template_text, variables, attachments_dir, attachm
         }
         
     except Exception as e:
-        print(f" ❌ Error: {e}")
+        logger.error("  ❌ Error: %s", e)
         return {
             'success': False,
             'error': str(e),
@@ -498,12 +842,23 @@ def create_outlook_draft(row, template_text, variables, attachments_dir, attachm
         }
 
 
+def write_eml(msg, filepath):
+    """Write msg to filepath exactly as str(msg) renders it, streamed instead of built in memory."""
+    # str(EmailMessage) renders with a utf8 clone of the message policy. Line
+    # endings follow the platform, as they did when the text was written in
+    # text mode, but the bytes now go straight to the file with no text layer.
+    # cte_type='7bit' makes BytesGenerator re-encode 8bit bodies (base64 or
+    # quoted-printable) the way the text Generator does, instead of writing
+    # them out raw.
+    policy = msg.policy.clone(utf8=True, linesep=os.linesep, cte_type='7bit')
+    with open(filepath, 'wb', buffering=WRITE_BUFFER_SIZE) as f:
+        BytesGenerator(f, mangle_from_=False, maxheaderlen=policy.max_line_length, policy=policy).flatten(msg)
+
+
 def sanitize_filename(filename):
     """Convert a string to a safe filename by removing/replacing problematic characters."""
-    # Replace problematic characters with underscores
-    sanitized = re.sub(r'[<>:"/\\|?*]', '_', filename)
-    # Remove any remaining control characters
-    sanitized = ''.join(char for char in sanitized if ord(char) >= 32)
+    # Replace problematic characters with underscores and drop control characters
+    sanitized = filename.translate(_FILENAME_TABLE)
     # Limit length and strip whitespace
     sanitized = sanitized.strip()[:100]
     return sanitized if sanitized else "email"
@@ -544,12 +899,17 @@ def create_zip_bundle(output_dir, zip_filename=None):
     print(f"  Creating ZIP bundle: {zip_filename}.zip")
 
     try:
-        with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zf:
+        # Email files are mostly base64, which deflate still shrinks by about a
+        # quarter, but the fastest level gets within a couple of percent of the
+        # default level's size
+        # ZipFile copies each member in 8 KB pieces; the buffer batches those writes
+        with open(zip_path, 'wb', buffering=WRITE_BUFFER_SIZE) as zip_file, \
+                zipfile.ZipFile(zip_file, 'w', zipfile.ZIP_DEFLATED, compresslevel=1) as zf:
             for filename in email_files:
                 file_path = os.path.join(output_dir, filename)
                 # Add file to ZIP with just the filename (no directory path)
                 zf.write(file_path, filename)
-                print(f"    Added: {filename}")
+                logger.debug("    Added: %s", filename)
 
         # Get ZIP file size
         zip_size_mb = os.path.getsize(zip_path) / (1024 * 1024)
@@ -565,7 +925,8 @@ def create_zip_bundle(output_dir, zip_filename=None):
 
 def main(template_path, excel_path, attachments_dir=None, output_dir="generated_emails",
          conditionals_path="conditional_lines.json", use_outlook=True, create_eml_backup=True, is_html_template=False,
-         attachment_mode="global", per_recipient_base=None, identifier_column=None, create_zip=True):
+         attachment_mode="global", per_recipient_base=None, identifier_column=None, create_zip=True,
+         html_only=False):
     """
     Main function to generate emails from template and Excel data.
 
@@ -582,6 +943,7 @@ def main(template_path, excel_path, attachments_dir=None, output_dir="generated_
         per_recipient_base: Base folder for per-recipient attachments
         identifier_column: Column to use for per-recipient folder names
         create_zip: Whether to create a ZIP bundle of all generated emails
+        html_only: Write .eml files with only an HTML body (no plain-text part)
 
     Returns:
         dict: Result dictionary with success status, counts, zip_path, and any warnings/errors
@@ -602,28 +964,155 @@ def main(template_path, excel_path, attachments_dir=None, output_dir="generated_
         print(f"❌ Error loading template: {e}")
         return False
     
-    # Extract variables from template
-    variables = extract_variables(template_text)
-    print(f"🔍 Found variables: {variables}")
+    # Load conditional lines if they exist
+    conditional_lines = {}
+    if conditionals_path and os.path.exists(conditionals_path):
+        try:
+            with open(conditionals_path, 'r', encoding='utf-8') as f:
+                conditional_lines = json.load(f)
+            print(f"🔀 Loaded {len(conditional_lines)} conditional lines")
+        except Exception as e:
+            print(f"⚠️ Warning: Could not load conditional lines: {e}")
     
-    # Load Excel data
+    # Load Excel data, parsing only the columns generation reads so wide
+    # sheets don't pay for unrelated cells
     print(f"📊 Loading Excel data from: {excel_path}")
+    needed_columns = generation_columns(extract_variables(template_text), conditional_lines, identifier_column)
     try:
-        df = pd.read_excel(excel_path)
+        df = pd.read_excel(
+            excel_path, engine=EXCEL_ENGINE,
+            usecols=lambda col: col in needed_columns or is_attachment_column(col)
+        )
         print(f"✅ Loaded {len(df)} rows")
     except Exception as e:
         print(f"❌ Error loading Excel: {e}")
         return False
     
-    # Load conditional lines if they exist
-    conditional_lines = {}
-    if conditionals_path and os.path.exists(conditionals_path):
+    return main_from_df(
+        df, template_text, conditional_lines, attachments_dir=attachments_dir, output_dir=output_dir,
+        use_outlook=use_outlook, create_eml_backup=create_eml_backup, is_html_template=is_html_template,
+        attachment_mode=attachment_mode, per_recipient_base=per_recipient_base,
+        identifier_column=identifier_column, create_zip=create_zip, html_only=html_only
+    )
+
+
+def recipient_label(idx, row):
+    """Name used for a row in progress output and .eml filenames."""
+    return row.get('FirstName') or row.get('Email') or row.get('email') or f"row_{idx}"
+
+
+def eml_filename(idx, row):
+    """Filename of the .eml draft written for a row."""
+    subject = row.get('Subject') or 'No Subject'
+    return f"{sanitize_filename(recipient_label(idx, row))}_{sanitize_filename(subject)}.eml"
+
+
+# Run settings for the batches a worker process writes, set once per worker by
+# _init_eml_worker instead of being pickled along with every batch
+_worker_settings = {}
+
+
+def _eml_process_pool(settings):
+    """
+    Start the worker pool for a parallel .eml run.
+
+    Workers are spawned rather than forked: the caller may be the threaded
+    Streamlit server (with error_handler's backup thread and logging handlers
+    live), and a forked child would inherit their locks in whatever state
+    they happened to be in. A spawned worker starts from a clean interpreter,
+    so the run settings reach it only through the initializer, pickled once.
+    """
+    return ProcessPoolExecutor(mp_context=multiprocessing.get_context("spawn"),
+                               initializer=_init_eml_worker, initargs=(settings,))
+
+
+def _init_eml_worker(settings):
+    """ProcessPoolExecutor initializer: keep the run settings and a fresh attachment cache."""
+    _worker_settings.clear()
+    _worker_settings.update(settings)
+    # Shared by every batch this worker runs, so it reads the global folder once
+    _worker_settings['attachment_cache'] = {}
+
+
+def _write_eml_batch(batch):
+    """
+    Write the .eml files for a batch of (idx, row, values, filename) tuples.
+
+    Runs inside a worker process set up by _init_eml_worker.
+
+    Returns:
+        tuple: (success_count, error_count)
+    """
+    settings = _worker_settings
+    success_count = 0
+    error_count = 0
+    for idx, row, values, filename in batch:
         try:
-            with open(conditionals_path, 'r', encoding='utf-8') as f:
-                conditional_lines = json.load(f)
-            print(f"🔀 Loaded {len(conditional_lines)} conditional lines")
+            rendered = render_body(
+                row, settings['template_text'], settings['variables'], settings['conditional_lines'],
+                settings['is_html_template'], values, settings['static_lines']
+            )
+            msg = create_email_message(
+                row, settings['template_text'], settings['variables'], settings['attachments_dir'],
+                settings['attachment_columns'], settings['conditional_lines'], settings['is_html_template'],
+                settings['attachment_mode'], settings['per_recipient_base'], settings['identifier_column'],
+                attachment_cache=settings['attachment_cache'], rendered=rendered,
+                address_columns=settings['address_columns'], html_only=settings['html_only']
+            )
+            write_eml(msg, os.path.join(settings['output_dir'], filename))
+            success_count += 1
         except Exception as e:
-            print(f"⚠️ Warning: Could not load conditional lines: {e}")
+            logger.error("  ❌ Error processing row %s: %s", idx + 1, e)
+            error_count += 1
+    return success_count, error_count
+
+
+def _parallel_eml_batches(records):
+    """
+    Split rows into worker batches for a parallel .eml run.
+
+    Returns None when the run should stay sequential: too few rows or
+    cores, a filename that can't be built, or two rows that would write the
+    same file (sequentially the last row wins; in parallel that would be a race).
+    """
+    workers = os.cpu_count() or 1
+    if len(records) < PARALLEL_MIN_ROWS or workers < 2:
+        return None
+    try:
+        named = [(idx, row, values, eml_filename(idx, row)) for idx, row, values in records]
+    except Exception:
+        return None
+    if len({filename.casefold() for _, _, _, filename in named}) != len(named):
+        return None
+    batch_size = -(-len(named) // (workers * 4))
+    return [named[i:i + batch_size] for i in range(0, len(named), batch_size)]
+
+
+def main_from_df(df, template_text, conditional_lines=None, attachments_dir=None, output_dir="generated_emails",
+                 use_outlook=True, create_eml_backup=True, is_html_template=False,
+                 attachment_mode="global", per_recipient_base=None, identifier_column=None, create_zip=True,
+                 html_only=False):
+    """
+    Generate emails from an in-memory template and DataFrame.
+
+    Same as main(), minus the file loading, so callers that already hold the
+    data (like the Streamlit app) don't have to round-trip it through disk.
+
+    Args:
+        df: DataFrame with one row per recipient
+        template_text: Email template content
+        conditional_lines: Dict of conditional key -> line to include (optional)
+        Remaining arguments are as for main().
+
+    Returns:
+        dict: Result dictionary with success status, counts, zip_path, and any warnings/errors
+    """
+    if conditional_lines is None:
+        conditional_lines = {}
+    
+    # Extract variables from template
+    variables = extract_variables(template_text)
+    print(f"🔍 Found variables: {variables}")
     
     # Create output directory
     if create_eml_backup:
@@ -631,10 +1120,13 @@ def main(template_path, excel_path, attachments_dir=None, output_dir="generated_
         print(f"📁 Output directory: {output_dir}")
     
     # Find attachment columns
-    attachment_columns = [col for col in df.columns if col.lower().startswith('attachment')]
+    attachment_columns = [col for col in df.columns if is_attachment_column(col)]
     if attachment_columns:
         print(f"📎 Found attachment columns: {attachment_columns}")
     
+    # Resolve which To/CC/BCC alias columns exist once, not per row
+    address_columns = resolve_address_columns(df.columns)
+    
     # Check Outlook availability
     if use_outlook:
         if OUTLOOK_AVAILABLE:
@@ -657,27 +1149,85 @@ def main(template_path, excel_path, attachments_dir=None, output_dir="generated_
     # Process each row
     success_count = 0
     error_count = 0
+    attachment_cache = {}
+    
+    # One Outlook connection for the whole run rather than a Dispatch per row
+    outlook = None
+    if use_outlook:
+        try:
+            outlook = connect_outlook()
+        except Exception as e:
+            print(f"⚠️ Could not connect to Outlook up front ({e}), connecting per email")
     
     print(f"\n🚀 Processing {len(df)} emails...")
     
-    for idx, row in df.iterrows():
-        print(f"\n📧 Processing row {idx + 1}/{len(df)}")
+    # Plain dicts per row: iterrows() would build (and dtype-coerce) a Series for each.
+    # Rows only carry the columns generation reads, so wide sheets don't pay for
+    # every unrelated cell; template values are checked and cleaned column-wise.
+    needed_columns = generation_columns(variables, conditional_lines, identifier_column) | set(attachment_columns)
+    row_columns = [col for col in df.columns if col in needed_columns]
+    records = list(zip(df.index, df[row_columns].to_dict('records'), template_values(df, variables)))
+    static_lines = static_conditional_lines(conditional_lines, variables)
+    
+    # Without Outlook (whose COM automation must stay on one thread) every row
+    # is an independent .eml file, so large runs are fanned out over processes
+    batches = None
+    if not use_outlook and create_eml_backup:
+        batches = _parallel_eml_batches(records)
+    completed_batches = 0
+    if batches:
+        print(f"⚡ Writing .eml files in {len(batches)} batches across worker processes")
+        try:
+            worker_settings = {
+                'template_text': template_text, 'variables': variables, 'conditional_lines': conditional_lines,
+                'static_lines': static_lines,
+                'attachments_dir': attachments_dir, 'attachment_columns': attachment_columns,
+                'is_html_template': is_html_template, 'attachment_mode': attachment_mode,
+                'per_recipient_base': per_recipient_base, 'identifier_column': identifier_column,
+                'output_dir': output_dir, 'address_columns': address_columns, 'html_only': html_only,
+            }
+            with _eml_process_pool(worker_settings) as executor:
+                for batch_success, batch_errors in executor.map(_write_eml_batch, batches):
+                    success_count += batch_success
+                    error_count += batch_errors
+                    completed_batches += 1
+            records = []
+        except Exception as e:
+            logger.warning("⚠️ Parallel generation failed (%s), writing the remaining %d batches sequentially",
+                           e, len(batches) - completed_batches)
+            # Batches are reported in order, so everything before the failure is
+            # written; the rest (some of which may be done too) is simply redone
+            records = [(idx, row, values) for batch in batches[completed_batches:]
+                       for idx, row, values, _ in batch]
+    
+    for idx, row, values in records:
+        logger.info("📧 Processing row %s/%d", idx + 1, len(df))
         
         # Get recipient name for filename
-        recipient_name = row.get('FirstName') or row.get('Email') or row.get('email') or f"row_{idx}"
-        print(f"  👤 Recipient: {recipient_name}")
+        recipient_name = recipient_label(idx, row)
+        logger.info("  👤 Recipient: %s", recipient_name)
         
         try:
+            # Render the body and parse the addresses once; they feed both the
+            # Outlook draft and the .eml backup
+            rendered = None
+            addresses = None
+            if use_outlook or create_eml_backup:
+                rendered = render_body(row, template_text, variables, conditional_lines, is_html_template, values, static_lines)
+                addresses = recipient_addresses(row, address_columns)
+            
             # Create Outlook .msg file if requested
             outlook_success = True
             if use_outlook:
                 result = create_outlook_draft(
                     row, template_text, variables, attachments_dir, attachment_columns, conditional_lines, 
-                    is_html_template, attachment_mode, per_recipient_base, identifier_column, output_dir
+                    is_html_template, attachment_mode, per_recipient_base, identifier_column, output_dir,
+                    attachment_cache=attachment_cache, rendered=rendered,
+                    address_columns=address_columns, addresses=addresses, outlook=outlook
                 )
                 outlook_success = result['success']
                 if not outlook_success:
-                    print(f"  ⚠️ Outlook .msg file creation failed: {result.get('error', 'Unknown error')}")
+                    logger.warning("  ⚠️ Outlook .msg file creation failed: %s", result.get('error', 'Unknown error'))
             
             # Create .eml backup if requested
             eml_success = True
@@ -685,19 +1235,19 @@ def main(template_path, excel_path, attachments_dir=None, output_dir="generated_
                 # Create email message
                 msg = create_email_message(
                     row, template_text, variables, attachments_dir, attachment_columns, conditional_lines, 
-                    is_html_template, attachment_mode, per_recipient_base, identifier_column
+                    is_html_template, attachment_mode, per_recipient_base, identifier_column,
+                    attachment_cache=attachment_cache, rendered=rendered,
+                    address_columns=address_columns, addresses=addresses,
+                    html_only=html_only
                 )
                 
                 # Generate filename
-                subject = row.get('Subject') or 'No Subject'
-                safe_subject = sanitize_filename(subject)
-                filename = f"{sanitize_filename(recipient_name)}_{safe_subject}.eml"
+                filename = eml_filename(idx, row)
                 filepath = os.path.join(output_dir, filename)
                 
                 # Save .eml file
-                with open(filepath, 'w', encoding='utf-8') as f:
-                    f.write(str(msg))
-                print(f"  💾 Saved: {filename}")
+                write_eml(msg, filepath)
+                logger.info("  💾 Saved: %s", filename)
             
             if outlook_success or eml_success:
                 success_count += 1
@@ -705,7 +1255,7 @@ def main(template_path, excel_path, attachments_dir=None, output_dir="generated_
                 error_count += 1
                 
         except Exception as e:
-            print(f"  ❌ Error processing row {idx + 1}: {e}")
+            logger.error("  ❌ Error processing row %s: %s", idx + 1, e)
             error_count += 1
     
     # Summary
@@ -743,6 +1293,15 @@ def main(template_path, excel_path, attachments_dir=None, output_dir="generated_
 
 
 if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Generate email drafts from a template and an Excel file")
+    parser.add_argument("--html-only", action="store_true",
+                        help="write .eml files with only an HTML body (no plain-text part)")
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    
     # Default configuration - modify as needed
     result = main(
         template_path="email_template.txt",
@@ -751,7 +1310,8 @@ if __name__ == "__main__":
         output_dir="generated_emails",
         conditionals_path="conditional_lines.json",
         use_outlook=True,
-        create_eml_backup=True
+        create_eml_backup=True,
+        html_only=args.html_only
     )
     
     if result:
@@ -3,22 +3,202 @@ Centralized Error Handling and Logging System
 Provides robust error handling, logging, and recovery utilities for the Email Generator app.
 """
 
+import importlib.util
 import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from logging.handlers import RotatingFileHandler
 import traceback
+import io
 import json
 import os
+import re
+import threading
 from pathlib import Path
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Any, Tuple
 import streamlit as st
-from functools import wraps
+from functools import lru_cache, wraps
 import shutil
 import pandas as pd
 
+# orjson parses and serializes several times faster than the stdlib json
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# pyarrow (only looked up here; pandas imports it on first use) lets
+# DataFrames be backed up as Feather
+PYARROW_AVAILABLE = importlib.util.find_spec("pyarrow") is not None
+
+
+# Validation patterns, compiled once at import
+_EMAIL_RE = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+_NESTED_PLACEHOLDER_RE = re.compile(r'\[([^\]]*\[.*?\].*?)\]')
+_PLACEHOLDER_RE = re.compile(r'\[([^\]]+)\]')
+
+# Default user-facing messages by exception type name
+_ERROR_MESSAGES = {
+    "FileNotFoundError": "The specified file could not be found. Please check the file path.",
+    "PermissionError": "Permission denied. Please check file permissions or try running as administrator.",
+    "pd.errors.EmptyDataError": "The Excel file appears to be empty. Please check the file contents.",
+    "KeyError": "Required data column is missing. Please check your Excel file structure.",
+    "ValueError": "Invalid data format detected. Please check your input data.",
+    "json.JSONDecodeError": "Invalid JSON format. Please check the configuration file.",
+    "ConnectionError": "Connection failed. Please check your network connection.",
+    "TimeoutError": "Operation timed out. Please try again.",
+    "MemoryError": "Not enough memory to complete the operation. Try processing fewer items.",
+    "OSError": "System error occurred. Please check disk space and file permissions."
+}
+
+
+def _dumps_json(data: Any, indent: bool = False) -> str:
+    """Serialize data to JSON text, indented by 2 if requested."""
+    if ORJSON_AVAILABLE:
+        try:
+            return orjson.dumps(data, option=orjson.OPT_INDENT_2 if indent else 0).decode('utf-8')
+        except TypeError:
+            pass  # e.g. non-string dict keys, which the stdlib json accepts
+    return json.dumps(data, indent=2 if indent else None)
+
+
+def _loads_json(text: str) -> Any:
+    """Parse JSON text (orjson errors subclass json.JSONDecodeError)."""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(text)
+    return json.loads(text)
+
+
+def _format_traceback(error: Exception) -> str:
+    """Format the traceback carried by error itself.
+
+    Unlike traceback.format_exc(), this doesn't depend on being called while
+    the exception is being handled.
+    """
+    return "".join(traceback.format_exception(type(error), error, error.__traceback__))
+
+
+# A failing batch logs the same kind of error from the same place over and
+# over, so the message and suggestions are worked out once per (type, context)
+@lru_cache(maxsize=128)
+def _user_friendly_message(error_type: type, context: str) -> Optional[str]:
+    """User-friendly message for an error type in a context, or None for the generic one."""
+    # Context-specific messages
+    if "Excel" in context or "excel" in context:
+        if issubclass(error_type, (pd.errors.EmptyDataError, KeyError)):
+            return "Excel file validation failed. Please ensure the file contains the required columns (Email, Subject) and is not empty."
+        elif issubclass(error_type, FileNotFoundError):
+            return "Excel file not found. Please upload a valid Excel file."
+    
+    if "Template" in context or "template" in context:
+        if issubclass(error_type, ValueError):
+            return "Template parsing error. Please check for matching brackets [] in your template."
+        elif issubclass(error_type, FileNotFoundError):
+            return "Template file not found. Please create or upload a template."
+    
+    if "Attachment" in context or "attachment" in context:
+        if issubclass(error_type, FileNotFoundError):
+            return "One or more attachment files could not be found. Please check the attachment directory."
+        elif issubclass(error_type, PermissionError):
+            return "Cannot access attachment files. Please check file permissions."
+    
+    if "Outlook" in context:
+        return "Outlook integration error. Please ensure Outlook is installed and running."
+    
+    # Default messages by error type
+    return _ERROR_MESSAGES.get(error_type.__name__)
+
+
+@lru_cache(maxsize=128)
+def _recovery_suggestions(error_type: type, context: str) -> Tuple[str, ...]:
+    """Recovery suggestions for an error type in a context."""
+    suggestions = []
+    
+    if issubclass(error_type, FileNotFoundError):
+        suggestions.extend([
+            "Verify the file path is correct",
+            "Check if the file was moved or deleted",
+            "Try uploading the file again"
+        ])
+    
+    elif issubclass(error_type, PermissionError):
+        suggestions.extend([
+            "Check file permissions",
+            "Close the file if it's open in another application",
+            "Try saving to a different location"
+        ])
+    
+    elif issubclass(error_type, (pd.errors.EmptyDataError, KeyError)):
+        suggestions.extend([
+            "Ensure the Excel file has the required columns",
+            "Check that the file is not empty",
+            "Verify column names match the template variables"
+        ])
+    
+    elif issubclass(error_type, ValueError):
+        if "template" in context.lower():
+            suggestions.extend([
+                "Check for matching brackets [] in the template",
+                "Ensure all placeholders are properly closed",
+                "Try using the template validator"
+            ])
+        else:
+            suggestions.extend([
+                "Check the data format",
+                "Ensure numeric fields contain valid numbers",
+                "Verify date formats are correct"
+            ])
+    
+    elif issubclass(error_type, MemoryError):
+        suggestions.extend([
+            "Try processing fewer emails at once",
+            "Close other applications to free up memory",
+            "Restart the application"
+        ])
+    
+    # Add general suggestions
+    suggestions.extend([
+        "Check the error log for more details",
+        "Try restoring from a recent backup",
+        "Reset the application if the issue persists"
+    ])
+    
+    return tuple(suggestions[:5])  # Return top 5 suggestions
+
+
+def _format_error_lines(number: int, error: Dict):
+    """Yield the report lines for one error record."""
+    yield f"Error #{number}"
+    yield "-" * 40
+    yield f"Time: {error['timestamp']}"
+    yield f"Severity: {error['severity']}"
+    yield f"Context: {error['context']}"
+    yield f"Error: {error['error_message']}"
+    yield f"User Message: {error['user_message']}"
+    
+    if error.get('recovery_suggestions'):
+        yield "Recovery Suggestions:"
+        for suggestion in error['recovery_suggestions']:
+            yield f"  - {suggestion}"
+    
+    if error.get('traceback'):
+        yield "Traceback:"
+        yield error['traceback']
+    
+    yield ""
+
 
 class ErrorHandler:
     """Centralized error handling and logging system."""
     
+    # Errors kept in history, and how many lines errors.jsonl may grow to
+    # before it is rewritten with just those
+    MAX_ERROR_HISTORY = 100
+    MAX_ERROR_LOG_LINES = 200
+    
     def __init__(self, log_dir: str = "logs", max_log_size: int = 10 * 1024 * 1024):
         """
         Initialize the error handler.
@@ -31,18 +211,24 @@ class ErrorHandler:
         self.log_dir.mkdir(exist_ok=True)
         
         self.log_file = self.log_dir / "app.log"
-        self.error_log_file = self.log_dir / "errors.json"
+        self.error_log_file = self.log_dir / "errors.jsonl"
         self.max_log_size = max_log_size
         
         # Initialize logging
         self._setup_logging()
         
-        # Initialize error history
-        self.error_history = self._load_error_history()
+        # Initialize error history (the oldest errors drop off as new ones arrive)
+        self.error_history = deque(self._load_error_history(), maxlen=self.MAX_ERROR_HISTORY)
         
         # Initialize backup directory
         self.backup_dir = Path("backups")
         self.backup_dir.mkdir(exist_ok=True)
+        
+        # Backups are written to disk in the background. A single worker keeps
+        # each write ahead of the cleanup that follows it.
+        self._backup_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="backup")
+        self._pending_backups = {}
+        self._backup_lock = threading.Lock()
     
     def _setup_logging(self):
         """Setup logging configuration."""
@@ -52,24 +238,21 @@ class ErrorHandler:
             datefmt='%Y-%m-%d %H:%M:%S'
         )
         
-        # Setup file handler with rotation
-        if self.log_file.exists() and self.log_file.stat().st_size > self.max_log_size:
-            # Rotate log file
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            rotated_file = self.log_dir / f"app_{timestamp}.log"
-            self.log_file.rename(rotated_file)
-            
-            # Keep only last 5 rotated logs
-            self._cleanup_old_logs()
-        
-        # Create file handler
-        file_handler = logging.FileHandler(self.log_file, encoding='utf-8')
-        file_handler.setFormatter(formatter)
-        
         # Setup logger
         self.logger = logging.getLogger('EmailGenerator')
         self.logger.setLevel(logging.DEBUG)
-        self.logger.addHandler(file_handler)
+        
+        # Create file handler: rotates when a write would pass max_log_size,
+        # keeping the last 5 logs (app.log.1 ... app.log.5), and doesn't open
+        # the file until the first record. Two handlers rotating the same file
+        # would rename it from under each other, so only one is attached.
+        log_path = os.path.abspath(self.log_file)
+        if not any(getattr(handler, 'baseFilename', None) == log_path for handler in self.logger.handlers):
+            file_handler = RotatingFileHandler(
+                log_path, maxBytes=self.max_log_size, backupCount=5, encoding='utf-8', delay=True
+            )
+            file_handler.setFormatter(formatter)
+            self.logger.addHandler(file_handler)
         
         # Also log to console in debug mode
         if os.environ.get('DEBUG'):
@@ -77,39 +260,65 @@ class ErrorHandler:
             console_handler.setFormatter(formatter)
             self.logger.addHandler(console_handler)
     
-    def _cleanup_old_logs(self):
-        """Keep only the 5 most recent rotated log files."""
-        log_files = sorted(
-            [f for f in self.log_dir.glob("app_*.log")],
-            key=lambda x: x.stat().st_mtime,
-            reverse=True
-        )
-        
-        # Delete old log files
-        for old_log in log_files[5:]:
-            try:
-                old_log.unlink()
-            except Exception:
-                pass
-    
     def _load_error_history(self) -> List[Dict]:
-        """Load error history from JSON file."""
+        """Load error history from the JSON Lines file (one error per line)."""
+        self._error_log_lines = 0
         if self.error_log_file.exists():
             try:
+                history = []
+                skipped = 0
                 with open(self.error_log_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
+                    for line_number, line in enumerate(f, 1):
+                        if not line.strip():
+                            continue
+                        try:
+                            history.append(_loads_json(line))
+                        except json.JSONDecodeError:
+                            # e.g. the last line, cut short by a crash mid-append
+                            skipped += 1
+                            self.logger.warning(f"Skipping unreadable line {line_number} of {self.error_log_file}")
+                # Rewrite the file with the first new error rather than append
+                # after a torn line
+                self._error_log_lines = self.MAX_ERROR_LOG_LINES if skipped else len(history)
+                return history[-self.MAX_ERROR_HISTORY:]
+            except Exception:
+                return []
+        
+        # History written before errors were appended line by line
+        legacy_file = self.log_dir / "errors.json"
+        if legacy_file.exists():
+            try:
+                with open(legacy_file, 'r', encoding='utf-8') as f:
+                    history = _loads_json(f.read())[-self.MAX_ERROR_HISTORY:]
+                # Carry it over in full with the first new error
+                self._error_log_lines = self.MAX_ERROR_LOG_LINES
+                return history
             except Exception:
                 return []
         return []
     
     def _save_error_history(self):
-        """Save error history to JSON file."""
+        """Rewrite the error history file with the last MAX_ERROR_HISTORY errors."""
         try:
-            # Keep only last 100 errors
-            self.error_history = self.error_history[-100:]
-            
             with open(self.error_log_file, 'w', encoding='utf-8') as f:
-                json.dump(self.error_history, f, indent=2)
+                f.writelines(_dumps_json(record) + '\n' for record in self.error_history)
+            self._error_log_lines = len(self.error_history)
+        except Exception as e:
+            self.logger.error(f"Failed to save error history: {str(e)}")
+    
+    def _append_error(self, error_record: Dict):
+        """Add an error to the history, appending one line to the file instead of rewriting it."""
+        self.error_history.append(error_record)
+        
+        # Once the file has grown well past the history it backs, compact it
+        if self._error_log_lines >= self.MAX_ERROR_LOG_LINES:
+            self._save_error_history()
+            return
+        
+        try:
+            with open(self.error_log_file, 'a', encoding='utf-8') as f:
+                f.write(_dumps_json(error_record) + '\n')
+            self._error_log_lines += 1
         except Exception as e:
             self.logger.error(f"Failed to save error history: {str(e)}")
     
@@ -134,7 +343,8 @@ class ErrorHandler:
             "error_type": type(error).__name__,
             "error_message": str(error),
             "user_message": user_message or self._get_user_friendly_message(error, context),
-            "traceback": traceback.format_exc() if severity == "CRITICAL" else "",
+            # Formatting walks every frame, so only critical errors pay for it
+            "traceback": _format_traceback(error) if severity == "CRITICAL" else "",
             "recovery_suggestions": self._get_recovery_suggestions(error, context)
         }
         
@@ -145,106 +355,18 @@ class ErrorHandler:
         )
         
         # Add to error history
-        self.error_history.append(error_record)
-        self._save_error_history()
+        self._append_error(error_record)
         
         return error_record
     
     def _get_user_friendly_message(self, error: Exception, context: str) -> str:
         """Generate user-friendly error message based on error type and context."""
-        error_messages = {
-            "FileNotFoundError": "The specified file could not be found. Please check the file path.",
-            "PermissionError": "Permission denied. Please check file permissions or try running as administrator.",
-            "pd.errors.EmptyDataError": "The Excel file appears to be empty. Please check the file contents.",
-            "KeyError": "Required data column is missing. Please check your Excel file structure.",
-            "ValueError": "Invalid data format detected. Please check your input data.",
-            "json.JSONDecodeError": "Invalid JSON format. Please check the configuration file.",
-            "ConnectionError": "Connection failed. Please check your network connection.",
-            "TimeoutError": "Operation timed out. Please try again.",
-            "MemoryError": "Not enough memory to complete the operation. Try processing fewer items.",
-            "OSError": "System error occurred. Please check disk space and file permissions."
-        }
-        
-        # Context-specific messages
-        if "Excel" in context or "excel" in context:
-            if isinstance(error, (pd.errors.EmptyDataError, KeyError)):
-                return "Excel file validation failed. Please ensure the file contains the required columns (Email, Subject) and is not empty."
-            elif isinstance(error, FileNotFoundError):
-                return "Excel file not found. Please upload a valid Excel file."
-        
-        if "Template" in context or "template" in context:
-            if isinstance(error, ValueError):
-                return "Template parsing error. Please check for matching brackets [] in your template."
-            elif isinstance(error, FileNotFoundError):
-                return "Template file not found. Please create or upload a template."
-        
-        if "Attachment" in context or "attachment" in context:
-            if isinstance(error, FileNotFoundError):
-                return "One or more attachment files could not be found. Please check the attachment directory."
-            elif isinstance(error, PermissionError):
-                return "Cannot access attachment files. Please check file permissions."
-        
-        if "Outlook" in context:
-            return "Outlook integration error. Please ensure Outlook is installed and running."
-        
-        # Default messages by error type
-        error_type = type(error).__name__
-        return error_messages.get(error_type, f"An unexpected error occurred: {str(error)}")
+        message = _user_friendly_message(type(error), context)
+        return message if message is not None else f"An unexpected error occurred: {str(error)}"
     
     def _get_recovery_suggestions(self, error: Exception, context: str) -> List[str]:
         """Get recovery suggestions based on error type and context."""
-        suggestions = []
-        
-        if isinstance(error, FileNotFoundError):
-            suggestions.extend([
-                "Verify the file path is correct",
-                "Check if the file was moved or deleted",
-                "Try uploading the file again"
-            ])
-        
-        elif isinstance(error, PermissionError):
-            suggestions.extend([
-                "Check file permissions",
-                "Close the file if it's open in another application",
-                "Try saving to a different location"
-            ])
-        
-        elif isinstance(error, (pd.errors.EmptyDataError, KeyError)):
-            suggestions.extend([
-                "Ensure the Excel file has the required columns",
-                "Check that the file is not empty",
-                "Verify column names match the template variables"
-            ])
-        
-        elif isinstance(error, ValueError):
-            if "template" in context.lower():
-                suggestions.extend([
-                    "Check for matching brackets [] in the template",
-                    "Ensure all placeholders are properly closed",
-                    "Try using the template validator"
-                ])
-            else:
-                suggestions.extend([
-                    "Check the data format",
-                    "Ensure numeric fields contain valid numbers",
-                    "Verify date formats are correct"
-                ])
-        
-        elif isinstance(error, MemoryError):
-            suggestions.extend([
-                "Try processing fewer emails at once",
-                "Close other applications to free up memory",
-                "Restart the application"
-            ])
-        
-        # Add general suggestions
-        suggestions.extend([
-            "Check the error log for more details",
-            "Try restoring from a recent backup",
-            "Reset the application if the issue persists"
-        ])
-        
-        return suggestions[:5]  # Return top 5 suggestions
+        return list(_recovery_suggestions(type(error), context))
     
     def create_backup(self, data: Any, backup_name: str, backup_type: str = "json") -> Optional[Path]:
         """
@@ -253,32 +375,62 @@ class ErrorHandler:
         Args:
             data: Data to backup
             backup_name: Name for the backup
-            backup_type: Type of backup (json, csv, text)
+            backup_type: Type of backup (json, csv, feather, text). A
+                DataFrame asked for as json or feather is written as feather
+                when pyarrow is installed and can store it, and as csv
+                otherwise (no pyarrow, or e.g. a column mixing numbers and
+                text), so check the suffix of the returned path rather than
+                assuming the requested type; restore_backup() reads either
+                one back.
         
         Returns:
-            Path to backup file or None if failed
+            Path to backup file or None if failed. A file is copied before
+            this returns; other data is written in the background, so its
+            path only exists once wait_for_backups() has returned;
+            restore_backup() waits for it on its own.
         """
         try:
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            backup_file = self.backup_dir / f"{backup_name}_{timestamp}.{backup_type}"
+            if isinstance(data, pd.DataFrame) and backup_type in ("json", "feather"):
+                backup_type = "feather" if PYARROW_AVAILABLE else "csv"
             
+            # Serialize (or copy) now, so the backup holds the data as it is
+            # at this call even if the caller goes on to modify it
+            content = None
+            source = None
             if backup_type == "json":
-                with open(backup_file, 'w', encoding='utf-8') as f:
-                    json.dump(data, f, indent=2)
+                content = _dumps_json(data, indent=True)
             elif backup_type == "csv" and isinstance(data, pd.DataFrame):
-                data.to_csv(backup_file, index=False)
+                content = data.to_csv(index=False)
+            elif backup_type == "feather":
+                # Binary and columnar: smaller and much faster to write and
+                # read back than CSV. Like the CSV backup, the index isn't kept.
+                try:
+                    buffer = io.BytesIO()
+                    data.reset_index(drop=True).to_feather(buffer)
+                    content = buffer.getvalue()
+                except Exception as e:
+                    # pyarrow needs one type per column; Excel columns such
+                    # as IDs often mix numbers and text
+                    self.logger.warning(f"Feather backup not possible, using CSV: {str(e)}")
+                    backup_type = "csv"
+                    content = data.to_csv(index=False)
             elif backup_type == "text":
-                with open(backup_file, 'w', encoding='utf-8') as f:
-                    f.write(str(data))
-            else:
-                # Copy file
-                if isinstance(data, (str, Path)):
-                    shutil.copy2(data, backup_file)
-            
-            self.logger.info(f"Created backup: {backup_file}")
+                content = str(data)
+            elif isinstance(data, (str, Path)):
+                source = data
             
-            # Clean up old backups (keep last 10)
-            self._cleanup_old_backups(backup_name)
+            with self._backup_lock:
+                backup_file = self._new_backup_file(backup_name, backup_type)
+                
+                if source is not None:
+                    # Copy file (callers back a file up right before overwriting it)
+                    shutil.copy2(source, backup_file)
+                
+                future = self._backup_executor.submit(self._write_backup, backup_file, content, backup_name)
+                self._pending_backups[backup_file] = future
+            # Added only once the future is registered, so even a write that
+            # has already finished takes its entry out again
+            future.add_done_callback(lambda _: self._pending_backups.pop(backup_file, None))
             
             return backup_file
             
@@ -286,6 +438,39 @@ class ErrorHandler:
             self.logger.error(f"Failed to create backup: {str(e)}")
             return None
     
+    def _new_backup_file(self, backup_name: str, backup_type: str) -> Path:
+        """Backup path not yet used on disk or by a pending write (call with _backup_lock held)."""
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+        backup_file = self.backup_dir / f"{backup_name}_{timestamp}.{backup_type}"
+        counter = 1
+        while backup_file in self._pending_backups or backup_file.exists():
+            backup_file = self.backup_dir / f"{backup_name}_{timestamp}_{counter}.{backup_type}"
+            counter += 1
+        return backup_file
+    
+    def _write_backup(self, backup_file: Path, content: Optional[Any], backup_name: str):
+        """Write a serialized backup to disk and prune old ones (runs on the backup thread)."""
+        try:
+            if isinstance(content, bytes):
+                with open(backup_file, 'wb') as f:
+                    f.write(content)
+            elif content is not None:
+                # newline='' keeps the line endings to_csv() chose
+                with open(backup_file, 'w', encoding='utf-8', newline='') as f:
+                    f.write(content)
+            
+            self.logger.info(f"Created backup: {backup_file}")
+            
+            # Clean up old backups (keep last 10)
+            self._cleanup_old_backups(backup_name)
+        except Exception as e:
+            self.logger.error(f"Failed to create backup: {str(e)}")
+    
+    def wait_for_backups(self):
+        """Block until every backup handed to the background writer is on disk."""
+        for future in list(self._pending_backups.values()):
+            future.result()
+    
     def _cleanup_old_backups(self, backup_name: str):
         """Keep only the 10 most recent backups for a given name."""
         backup_files = sorted(
@@ -311,6 +496,11 @@ class ErrorHandler:
             Tuple of (success, data or error message)
         """
         try:
+            # The backup may still be on its way to disk
+            pending = self._pending_backups.get(backup_file)
+            if pending is not None:
+                pending.result()
+            
             if not backup_file.exists():
                 return False, "Backup file not found"
             
@@ -318,9 +508,13 @@ class ErrorHandler:
             
             if ext == ".json":
                 with open(backup_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
+                    data = _loads_json(f.read())
             elif ext == ".csv":
+                # The default C parser, not pyarrow's: that one turns ISO date
+                # strings into dates, which the templates then render differently
                 data = pd.read_csv(backup_file)
+            elif ext == ".feather":
+                data = pd.read_feather(backup_file)
             elif ext in [".txt", ".html"]:
                 with open(backup_file, 'r', encoding='utf-8') as f:
                     data = f.read()
@@ -337,46 +531,33 @@ class ErrorHandler:
     
     def get_recent_errors(self, limit: int = 10) -> List[Dict]:
         """Get recent errors from history."""
-        return self.error_history[-limit:]
+        return list(self.error_history)[-limit:]
     
     def clear_error_history(self):
         """Clear error history."""
-        self.error_history = []
+        self.error_history.clear()
         self._save_error_history()
         self.logger.info("Error history cleared")
     
     def export_error_report(self) -> str:
         """Export error report as formatted text."""
-        report = ["=" * 80]
-        report.append("EMAIL GENERATOR ERROR REPORT")
-        report.append(f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-        report.append("=" * 80)
-        report.append("")
+        return "\n".join(self._iter_report_lines())
+    
+    def _iter_report_lines(self):
+        """Yield the lines of the error report covering the last 20 errors."""
+        yield "=" * 80
+        yield "EMAIL GENERATOR ERROR REPORT"
+        yield f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
+        yield "=" * 80
+        yield ""
         
         if not self.error_history:
-            report.append("No errors recorded.")
-        else:
-            for i, error in enumerate(self.error_history[-20:], 1):
-                report.append(f"Error #{i}")
-                report.append("-" * 40)
-                report.append(f"Time: {error['timestamp']}")
-                report.append(f"Severity: {error['severity']}")
-                report.append(f"Context: {error['context']}")
-                report.append(f"Error: {error['error_message']}")
-                report.append(f"User Message: {error['user_message']}")
-                
-                if error.get('recovery_suggestions'):
-                    report.append("Recovery Suggestions:")
-                    for suggestion in error['recovery_suggestions']:
-                        report.append(f"  - {suggestion}")
-                
-                if error.get('traceback'):
-                    report.append("Traceback:")
-                    report.append(error['traceback'])
-                
-                report.append("")
+            yield "No errors recorded."
+            return
         
-        return "\n".join(report)
+        recent = islice(self.error_history, max(0, len(self.error_history) - 20), None)
+        for i, error in enumerate(recent, 1):
+            yield from _format_error_lines(i, error)
 
 
 class SafeOperation:
@@ -438,8 +619,24 @@ class SafeOperation:
         return wrapper
 
 
-# Global error handler instance
-error_handler = ErrorHandler()
+# Global error handler instance, created on first use so that importing a
+# validation helper doesn't set up log files and directories
+_error_handler: Optional[ErrorHandler] = None
+
+
+def get_error_handler() -> ErrorHandler:
+    """Return the global error handler, creating it on first call."""
+    global _error_handler
+    if _error_handler is None:
+        _error_handler = ErrorHandler()
+    return _error_handler
+
+
+def __getattr__(name: str) -> Any:
+    """Keep `from error_handler import error_handler` working (PEP 562)."""
+    if name == 'error_handler':
+        return get_error_handler()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def validate_email_address(email: str) -> Tuple[bool, str]:
@@ -452,14 +649,9 @@ def validate_email_address(email: str) -> Tuple[bool, str]:
     Returns:
         Tuple of (is_valid, error_message)
     """
-    import re
-    
     if not email or not email.strip():
         return False, "Email address is empty"
     
-    # Basic email regex pattern
-    email_pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-    
     # Handle multiple emails (comma-separated)
     emails = [e.strip() for e in email.split(',')]
     invalid_emails = []
@@ -469,7 +661,7 @@ def validate_email_address(email: str) -> Tuple[bool, str]:
         if single_email.startswith('[') and single_email.endswith(']'):
             continue
         
-        if not re.match(email_pattern, single_email):
+        if not _EMAIL_RE.match(single_email):
             invalid_emails.append(single_email)
     
     if invalid_emails:
@@ -527,14 +719,16 @@ def validate_template_syntax(template_text: str) -> Tuple[bool, List[str]]:
     if '[]' in template_text:
         errors.append("Empty placeholder [] found")
     
-    # Check for nested placeholders
-    import re
-    placeholders = re.findall(r'\[([^\]]*\[.*?\].*?)\]', template_text)
-    if placeholders:
-        errors.append(f"Nested placeholders found: {placeholders}")
+    all_placeholders = _PLACEHOLDER_RE.findall(template_text)
+    
+    # Check for nested placeholders. Any nesting leaves a '[' inside one of the
+    # flat placeholders, so the nested pattern only has to run when one does.
+    if any('[' in placeholder for placeholder in all_placeholders):
+        placeholders = _NESTED_PLACEHOLDER_RE.findall(template_text)
+        if placeholders:
+            errors.append(f"Nested placeholders found: {placeholders}")
     
     # Check for special characters in placeholders
-    all_placeholders = re.findall(r'\[([^\]]+)\]', template_text)
     for placeholder in all_placeholders:
         if not placeholder.replace(':', '').replace('_', '').replace(' ', '').isalnum():
             if not placeholder.startswith('Conditional:'):
@@ -582,7 +776,6 @@ def create_diagnostic_report() -> Dict[str, Any]:
         report["disk_space"] = {"error": "Could not determine disk space"}
     
     # Get recent errors
-    if 'error_handler' in globals():
-        report["recent_errors"] = error_handler.get_recent_errors(5)
+    report["recent_errors"] = get_error_handler().get_recent_errors(5)
     
     return report
\ No newline at end of file
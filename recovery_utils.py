@@ -11,7 +11,7 @@ from datetime import datetime, timedelta
 from typing import Dict, Any, Optional
 import pandas as pd
 import shutil
-from error_handler import error_handler
+from error_handler import get_error_handler
 
 
 class SessionRecovery:
@@ -62,7 +62,7 @@ class SessionRecovery:
             return True
             
         except Exception as e:
-            error_handler.log_error(e, "Auto-save Session")
+            get_error_handler().log_error(e, "Auto-save Session")
             return False
     
     def recover_session(self, session_state: Any) -> bool:
@@ -96,7 +96,7 @@ class SessionRecovery:
             return True
             
         except Exception as e:
-            error_handler.log_error(e, "Session Recovery")
+            get_error_handler().log_error(e, "Session Recovery")
             return False
     
     def clear_auto_save(self):
@@ -111,7 +111,7 @@ class SessionRecovery:
             
             return True
         except Exception as e:
-            error_handler.log_error(e, "Clear Auto-save")
+            get_error_handler().log_error(e, "Clear Auto-save")
             return False
     
     def export_session(self, session_state: Any) -> Optional[Path]:
@@ -137,7 +137,7 @@ class SessionRecovery:
             return export_file
             
         except Exception as e:
-            error_handler.log_error(e, "Export Session")
+            get_error_handler().log_error(e, "Export Session")
             return None
     
     def import_session(self, file_path: Path, session_state: Any) -> bool:
@@ -158,7 +158,7 @@ class SessionRecovery:
             return True
             
         except Exception as e:
-            error_handler.log_error(e, "Import Session")
+            get_error_handler().log_error(e, "Import Session")
             return False
 
 
@@ -286,7 +286,7 @@ class ApplicationDiagnostics:
         
         # Test error logging
         try:
-            error_handler.logger.info("Test log entry")
+            get_error_handler().logger.info("Test log entry")
             tests['error_logging'] = True
         except Exception:
             tests['error_logging'] = False
@@ -337,7 +337,7 @@ def display_error_dashboard():
     st.subheader("🔍 Error Dashboard")
     
     # Recent errors
-    recent_errors = error_handler.get_recent_errors(5)
+    recent_errors = get_error_handler().get_recent_errors(5)
     
     if recent_errors:
         st.warning(f"Found {len(recent_errors)} recent errors")
@@ -363,13 +363,13 @@ def display_error_dashboard():
     col1, col2 = st.columns(2)
     with col1:
         if st.button("Clear Error History", use_container_width=True):
-            error_handler.clear_error_history()
+            get_error_handler().clear_error_history()
             st.success("Error history cleared")
             st.rerun()
     
     with col2:
         if st.button("Export Error Report", use_container_width=True):
-            report = error_handler.export_error_report()
+            report = get_error_handler().export_error_report()
             st.download_button(
                 "Download Report",
                 report,
@@ -10,6 +10,35 @@ from datetime import datetime
 from typing import Dict, List, Optional, Any
 import re
 
+# orjson parses and serializes several times faster than the stdlib json
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# Placeholder patterns, compiled once at import
+_VAR_RE = re.compile(r"\[([^\]]+)\]")
+_COND_RE = re.compile(r"\[Conditional:([^\]]+)\]")
+
+
+def _load_json(filepath: Path) -> Any:
+    """Read a JSON file (orjson errors subclass json.JSONDecodeError)."""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(filepath.read_bytes())
+    with open(filepath, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _dump_json(filepath: Path, data: Any) -> None:
+    """Write data as indented UTF-8 JSON."""
+    if ORJSON_AVAILABLE:
+        filepath.write_bytes(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+        return
+    with open(filepath, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+
+
 class TemplateManager:
     def __init__(self, templates_dir: str = "templates"):
         """Initialize the template manager with a templates directory."""
@@ -19,14 +48,14 @@ class TemplateManager:
     def extract_variables(self, template_text: str) -> List[str]:
         """Extract all variable placeholders from template text."""
         # Extract regular variables [VarName]
-        all_vars = re.findall(r"\[([^\]]+)\]", template_text)
+        all_vars = _VAR_RE.findall(template_text)
         # Filter out conditional placeholders
         regular_vars = [var for var in all_vars if not var.startswith("Conditional:")]
         return regular_vars
     
     def extract_conditional_keys(self, template_text: str) -> List[str]:
         """Extract conditional placeholder keys from template text."""
-        conditionals = re.findall(r"\[Conditional:([^\]]+)\]", template_text)
+        conditionals = _COND_RE.findall(template_text)
         return conditionals
     
     def save_template(self, name: str, template_text: str, description: str = "", format_type: str = "plain", template_html: Optional[str] = None) -> Dict[str, Any]:
@@ -69,16 +98,14 @@ class TemplateManager:
             # If updating existing template, preserve original creation date
             if is_overwrite:
                 try:
-                    with open(filepath, 'r', encoding='utf-8') as f:
-                        existing_data = json.load(f)
-                        template_data["created_date"] = existing_data.get("created_date", template_data["created_date"])
-                        template_data["modified_date"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                    existing_data = _load_json(filepath)
+                    template_data["created_date"] = existing_data.get("created_date", template_data["created_date"])
+                    template_data["modified_date"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
                 except:
                     pass  # If we can't read the existing file, just use new creation date
             
             # Save to file
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(template_data, f, indent=2, ensure_ascii=False)
+            _dump_json(filepath, template_data)
             
             # Return appropriate message
             if is_overwrite:
@@ -121,8 +148,7 @@ class TemplateManager:
                     "message": f"Template file not found: {filename}"
                 }
             
-            with open(filepath, 'r', encoding='utf-8') as f:
-                template_data = json.load(f)
+            template_data = _load_json(filepath)
             
             return {
                 "success": True,
@@ -160,9 +186,8 @@ class TemplateManager:
                 }
             
             # Load template to get its name for the message
-            with open(filepath, 'r', encoding='utf-8') as f:
-                template_data = json.load(f)
-                template_name = template_data.get('name', filename)
+            template_data = _load_json(filepath)
+            template_name = template_data.get('name', filename)
             
             # Delete the file
             filepath.unlink()
@@ -191,8 +216,7 @@ class TemplateManager:
             # Get all JSON files in templates directory
             for filepath in sorted(self.templates_dir.glob("*.json")):
                 try:
-                    with open(filepath, 'r', encoding='utf-8') as f:
-                        template_data = json.load(f)
+                    template_data = _load_json(filepath)
                     
                     # Add filename to the data
                     template_data['filename'] = filepath.name
@@ -295,8 +319,7 @@ class TemplateManager:
                 }
             
             # Load existing template
-            with open(filepath, 'r', encoding='utf-8') as f:
-                template_data = json.load(f)
+            template_data = _load_json(filepath)
             
             # Update fields
             template_data['template_text'] = template_text
@@ -314,8 +337,7 @@ class TemplateManager:
                 template_data['template_html'] = template_html
             
             # Save updated template
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(template_data, f, indent=2, ensure_ascii=False)
+            _dump_json(filepath, template_data)
             
             return {
                 "success": True,
@@ -5,9 +5,12 @@ Tests the enhanced error handling and recovery capabilities.
 
 import streamlit as st
 import pandas as pd
+import io
 import json
 from pathlib import Path
+import os
 import sys
+import tempfile
 import traceback
 
 # Add current directory to path
@@ -59,6 +62,35 @@ def test_error_logging():
         print(f"❌ Error logging test failed: {e}")
         return False
 
+def test_torn_error_history_line():
+    """Test that a truncated line in errors.jsonl is skipped instead of losing the whole history."""
+    print("\n=== Testing Torn Error History Line ===")
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        log_dir = root / "logs"
+        log_dir.mkdir()
+        saved = [{"error_message": f"saved {i}", "severity": "ERROR"} for i in range(3)]
+        with open(log_dir / "errors.jsonl", 'w', encoding='utf-8') as f:
+            f.writelines(json.dumps(record) + '\n' for record in saved)
+            f.write('{"error_message": "cut sh')  # crash mid-append
+        
+        handler = _scratch_handler(root)
+        try:
+            assert list(handler.error_history) == saved
+            handler.log_error(ValueError("after the crash"), context="Torn", severity="WARNING")
+            expected = [r['error_message'] for r in saved] + ["after the crash"]
+            assert [r['error_message'] for r in _read_error_log(handler)] == expected
+        finally:
+            _close_scratch_handler(handler)
+        
+        reloaded = _scratch_handler(root)
+        try:
+            assert [r['error_message'] for r in reloaded.error_history] == expected
+            print(f"✅ Torn line skipped, {len(expected)} errors kept")
+        finally:
+            _close_scratch_handler(reloaded)
+
 def test_validation_functions():
     """Test validation functions."""
     print("\n=== Testing Validation Functions ===")
@@ -119,6 +151,8 @@ def test_backup_restore():
             "test_backup",
             "json"
         )
+        # Backups are written in the background
+        error_handler.wait_for_backups()
         
         if backup_file and backup_file.exists():
             print(f"✅ Backup created: {backup_file}")
@@ -143,6 +177,7 @@ def test_backup_restore():
             "test_csv_backup",
             "csv"
         )
+        error_handler.wait_for_backups()
         
         if csv_backup and csv_backup.exists():
             print(f"✅ CSV backup created: {csv_backup}")
@@ -153,6 +188,237 @@ def test_backup_restore():
         print(f"❌ Backup/restore test failed: {e}")
         traceback.print_exc()
 
+def _scratch_handler(root: Path) -> "ErrorHandler":
+    """ErrorHandler that keeps its logs and backups under root instead of the working directory."""
+    handler = ErrorHandler(log_dir=str(root / "logs"))
+    handler.backup_dir = root / "backups"
+    handler.backup_dir.mkdir(exist_ok=True)
+    return handler
+
+def _close_scratch_handler(handler: "ErrorHandler"):
+    """Finish pending backups and detach the handler's log file so root can be removed."""
+    handler.wait_for_backups()
+    log_path = os.path.abspath(handler.log_file)
+    for log_handler in list(handler.logger.handlers):
+        if getattr(log_handler, 'baseFilename', None) == log_path:
+            handler.logger.removeHandler(log_handler)
+            log_handler.close()
+
+def test_wait_for_backups():
+    """Test that every path create_backup returns is on disk once wait_for_backups() returns."""
+    print("\n=== Testing Background Backup Writes ===")
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        handler = _scratch_handler(root)
+        try:
+            source_file = root / "source.txt"
+            source_file.write_text("file to copy", encoding='utf-8')
+            test_df = pd.DataFrame({'Name': ['Alice', 'Bob'], 'Count': [1, 2]})
+            
+            backup_files = [
+                handler.create_backup({"key": "value"}, "wait_json", "json"),
+                handler.create_backup("some text", "wait_text", "text"),
+                handler.create_backup(test_df, "wait_csv", "csv"),
+                handler.create_backup(test_df, "wait_frame", "json"),
+                handler.create_backup(source_file, "wait_copy", "txt"),
+            ]
+            assert all(backup_files), f"A backup failed to start: {backup_files}"
+            
+            handler.wait_for_backups()
+            for backup_file in backup_files:
+                assert backup_file.exists(), f"Backup missing after wait_for_backups(): {backup_file}"
+            assert backup_files[-1].read_text(encoding="utf-8") == "file to copy"
+            print(f"✅ All {len(backup_files)} backups on disk")
+        finally:
+            _close_scratch_handler(handler)
+
+def test_file_backup_before_overwrite():
+    """Test that a file backup holds the contents the file had when create_backup was called."""
+    print("\n=== Testing File Backup Before Overwrite ===")
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        handler = _scratch_handler(root)
+        try:
+            settings_file = root / "settings.txt"
+            settings_file.write_text("old settings", encoding='utf-8')
+            
+            backup_file = handler.create_backup(settings_file, "settings", "txt")
+            settings_file.write_text("new settings", encoding='utf-8')
+            
+            handler.wait_for_backups()
+            assert backup_file.read_text(encoding='utf-8') == "old settings"
+            print("✅ File backup kept the contents from before the overwrite")
+        finally:
+            _close_scratch_handler(handler)
+
+def test_same_name_backups():
+    """Test that backups of one name made back to back get their own files and leave nothing pending."""
+    print("\n=== Testing Same-Name Backups ===")
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        handler = _scratch_handler(Path(tmp))
+        try:
+            backup_files = [handler.create_backup(f"version {i}", "same_name", "text") for i in range(5)]
+            assert len(set(backup_files)) == len(backup_files), f"Backup paths collided: {backup_files}"
+            
+            handler.wait_for_backups()
+            for i, backup_file in enumerate(backup_files):
+                assert backup_file.read_text(encoding='utf-8') == f"version {i}"
+            
+            # Done-callbacks run on the single backup thread before it takes
+            # the next task, so once this no-op has run they all have
+            handler._backup_executor.submit(lambda: None).result()
+            assert not handler._pending_backups, f"Finished backups still pending: {list(handler._pending_backups)}"
+            print(f"✅ {len(backup_files)} same-name backups written to separate files")
+        finally:
+            _close_scratch_handler(handler)
+
+def _read_error_log(handler: "ErrorHandler") -> list:
+    """Error records in the handler's errors.jsonl, one per line."""
+    with open(handler.error_log_file, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def test_error_history_compaction():
+    """Test that errors.jsonl is rewritten to the latest MAX_ERROR_HISTORY errors once it passes MAX_ERROR_LOG_LINES."""
+    print("\n=== Testing Error History Compaction ===")
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        handler = _scratch_handler(Path(tmp))
+        try:
+            for i in range(handler.MAX_ERROR_LOG_LINES):
+                handler.log_error(ValueError(f"error {i}"), context="Compaction", severity="WARNING")
+            assert len(_read_error_log(handler)) == handler.MAX_ERROR_LOG_LINES
+            
+            # The next error pushes the file past its limit and compacts it
+            last = handler.MAX_ERROR_LOG_LINES
+            handler.log_error(ValueError(f"error {last}"), context="Compaction", severity="WARNING")
+            records = _read_error_log(handler)
+            expected = [f"error {i}" for i in range(last + 1 - handler.MAX_ERROR_HISTORY, last + 1)]
+            assert [r['error_message'] for r in records] == expected
+            assert [r['error_message'] for r in handler.get_recent_errors(handler.MAX_ERROR_HISTORY)] == expected
+            print(f"✅ errors.jsonl compacted to the {len(records)} most recent errors")
+        finally:
+            _close_scratch_handler(handler)
+
+def test_legacy_error_history_migration():
+    """Test that a history left in the old errors.json is loaded and carried over to errors.jsonl."""
+    print("\n=== Testing Legacy Error History Migration ===")
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        log_dir = root / "logs"
+        log_dir.mkdir()
+        legacy = [{"error_message": f"legacy {i}", "severity": "ERROR"} for i in range(150)]
+        with open(log_dir / "errors.json", 'w', encoding='utf-8') as f:
+            json.dump(legacy, f)
+        
+        handler = _scratch_handler(root)
+        try:
+            assert list(handler.error_history) == legacy[-handler.MAX_ERROR_HISTORY:]
+            assert not handler.error_log_file.exists()
+            
+            handler.log_error(ValueError("first new error"), context="Migration", severity="WARNING")
+            expected = [r['error_message'] for r in legacy[-handler.MAX_ERROR_HISTORY + 1:]] + ["first new error"]
+            assert [r['error_message'] for r in _read_error_log(handler)] == expected
+        finally:
+            _close_scratch_handler(handler)
+        
+        reloaded = _scratch_handler(root)
+        try:
+            assert [r['error_message'] for r in reloaded.error_history] == expected
+            print(f"✅ Legacy history migrated to errors.jsonl ({len(expected)} errors)")
+        finally:
+            _close_scratch_handler(reloaded)
+
+def test_dataframe_backup_round_trip():
+    """Test that DataFrame backups restore to the same frame, with and without pyarrow."""
+    print("\n=== Testing DataFrame Backup Round Trip ===")
+    
+    error_handler_module = sys.modules[ErrorHandler.__module__]
+    pyarrow_available = error_handler_module.PYARROW_AVAILABLE
+    test_df = pd.DataFrame({
+        'Name': ['Alice', 'Bob', 'Charlie'],
+        'Email': ['alice@test.com', 'bob@test.com', 'charlie@test.com'],
+        'Count': [1, 2, 3],
+    })
+    
+    cases = [(False, ".csv")]
+    if pyarrow_available:
+        cases.insert(0, (True, ".feather"))
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        handler = _scratch_handler(Path(tmp))
+        try:
+            for use_pyarrow, expected_suffix in cases:
+                error_handler_module.PYARROW_AVAILABLE = use_pyarrow
+                try:
+                    backup_file = handler.create_backup(test_df, f"frame_{expected_suffix[1:]}", "json")
+                finally:
+                    error_handler_module.PYARROW_AVAILABLE = pyarrow_available
+                
+                assert backup_file is not None, "DataFrame backup failed"
+                assert backup_file.suffix == expected_suffix, f"Expected a {expected_suffix} backup, got {backup_file.name}"
+                
+                handler.wait_for_backups()
+                success, restored = handler.restore_backup(backup_file)
+                assert success, f"Restore failed: {restored}"
+                pd.testing.assert_frame_equal(restored, test_df, check_dtype=False)
+                print(f"✅ DataFrame round trip via {expected_suffix}")
+        finally:
+            _close_scratch_handler(handler)
+
+def test_mixed_type_dataframe_backup():
+    """Test that a DataFrame pyarrow can't store still gets backed up, as CSV."""
+    print("\n=== Testing Mixed-Type DataFrame Backup ===")
+    
+    # An Excel ID column mixing numbers and text
+    test_df = pd.DataFrame({
+        'ID': [1, 'A2', 3],
+        'Name': ['Alice', 'Bob', 'Charlie'],
+    })
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        handler = _scratch_handler(Path(tmp))
+        try:
+            backup_file = handler.create_backup(test_df, "mixed_frame", "json")
+            assert backup_file is not None, "Mixed-type DataFrame backup failed"
+            assert backup_file.suffix == ".csv", f"Expected a CSV fallback, got {backup_file.name}"
+            
+            success, restored = handler.restore_backup(backup_file)
+            assert success, f"Restore failed: {restored}"
+            expected = pd.read_csv(io.StringIO(test_df.to_csv(index=False)))
+            pd.testing.assert_frame_equal(restored, expected)
+            print("✅ Mixed-type DataFrame round trip via .csv")
+        finally:
+            _close_scratch_handler(handler)
+
+def test_csv_backup_keeps_date_strings():
+    """Test that date- and timestamp-like text in a CSV backup is restored as text."""
+    print("\n=== Testing CSV Backup Date Strings ===")
+    
+    test_df = pd.DataFrame({
+        'Name': ['Alice', 'Bob'],
+        'StartDate': ['2024-01-05', '2024-02-10'],
+        'LastLogin': ['2024-01-05 10:30:00', '2024-02-10T08:00:00'],
+    })
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        handler = _scratch_handler(Path(tmp))
+        try:
+            backup_file = handler.create_backup(test_df, "dated_frame", "csv")
+            assert backup_file is not None and backup_file.suffix == ".csv"
+            
+            success, restored = handler.restore_backup(backup_file)
+            assert success, f"Restore failed: {restored}"
+            for column in ('StartDate', 'LastLogin'):
+                assert list(restored[column]) == list(test_df[column]), f"{column} changed: {list(restored[column])}"
+            pd.testing.assert_frame_equal(restored, pd.read_csv(backup_file))
+            print("✅ Date strings restored unchanged")
+        finally:
+            _close_scratch_handler(handler)
+
 def test_session_recovery():
     """Test session recovery functionality."""
     print("\n=== Testing Session Recovery ===")
@@ -293,8 +559,17 @@ def main():
     
     # Run all tests
     test_error_logging()
+    test_error_history_compaction()
+    test_legacy_error_history_migration()
+    test_torn_error_history_line()
     test_validation_functions()
     test_backup_restore()
+    test_wait_for_backups()
+    test_file_backup_before_overwrite()
+    test_same_name_backups()
+    test_dataframe_backup_round_trip()
+    test_mixed_type_dataframe_backup()
+    test_csv_backup_keeps_date_strings()
     test_session_recovery()
     test_diagnostics()
     test_error_report()
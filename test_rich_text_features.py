@@ -10,6 +10,9 @@ import json
 import pandas as pd
 from pathlib import Path
 import tempfile
+from email import policy
+from email.message import EmailMessage
+from email.parser import BytesParser
 
 # Add parent directory to path for imports
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
@@ -254,6 +257,66 @@ def test_variable_preservation_in_html():
     print("✅ All variables correctly replaced in HTML template")
     return True
 
+def test_html_only_email():
+    """Test that html_only writes a single text/html part instead of multipart/alternative"""
+    print("\n=== Testing HTML-only Emails ===")
+    
+    test_data = pd.DataFrame({
+        'FirstName': ['Alice'],
+        'Email': ['alice@example.com'],
+        'Subject': ['Welcome']
+    })
+    template = "Hello [FirstName],\n**Welcome** aboard!"
+    
+    with tempfile.TemporaryDirectory() as output_dir:
+        result = efg.main_from_df(
+            test_data, template, output_dir=output_dir,
+            use_outlook=False, create_zip=False, html_only=True
+        )
+        assert result['success_count'] == 1
+        
+        eml_files = [f for f in os.listdir(output_dir) if f.endswith('.eml')]
+        assert len(eml_files) == 1
+        with open(os.path.join(output_dir, eml_files[0]), 'rb') as f:
+            msg = BytesParser(policy=policy.default).parse(f)
+    
+    parts = list(msg.walk())
+    print(f"Parts: {[part.get_content_type() for part in parts]}")
+    assert not msg.is_multipart(), "html_only email should not be multipart"
+    assert msg.get_content_type() == 'text/html'
+    assert '<b>Welcome</b>' in msg.get_content()
+    
+    print("✅ HTML-only email has a single text/html part")
+    return True
+
+def test_write_eml_matches_str():
+    """Test that write_eml writes the same bytes as str(msg) for non-ASCII bodies"""
+    print("\n=== Testing .eml Output Encoding ===")
+    
+    msg = EmailMessage()
+    msg['To'] = 'Zoë <zoe@example.com>'
+    msg['Subject'] = 'Grüße an Zoë'
+    msg.set_content("Hallo Zoë, ünïcode in a mostly ASCII body that is long enough for 8bit.\n" * 5)
+    msg.add_alternative("<p>Hallo <b>Zoë</b>, ünïcode in HTML.</p>\n" * 3, subtype='html')
+    
+    with tempfile.TemporaryDirectory() as output_dir:
+        filepath = os.path.join(output_dir, 'encoding.eml')
+        efg.write_eml(msg, filepath)
+        with open(filepath, 'rb') as f:
+            written = f.read()
+    
+    # What the text-mode write of str(msg) used to put on disk
+    expected = str(msg).replace('\n', os.linesep).encode('utf-8')
+    assert b'Content-Transfer-Encoding: 8bit' not in written, "Non-ASCII bodies should not be written as raw 8bit"
+    assert written.count(b'Content-Transfer-Encoding: base64') == 2
+    assert written == expected, "write_eml output differs from str(msg)"
+    
+    parsed = BytesParser(policy=policy.default).parsebytes(written)
+    assert 'Zoë' in parsed.get_body(('plain',)).get_content()
+    
+    print("✅ Non-ASCII bodies are base64-encoded exactly as str(msg) renders them")
+    return True
+
 def main():
     """Run all tests"""
     print("\n" + "="*50)
@@ -261,7 +324,7 @@ def main():
     print("="*50)
     
     tests_passed = 0
-    tests_total = 3
+    tests_total = 5
     
     # Run tests
     if test_html_template_creation():
@@ -273,6 +336,12 @@ def main():
     if test_variable_preservation_in_html():
         tests_passed += 1
     
+    if test_html_only_email():
+        tests_passed += 1
+    
+    if test_write_eml_matches_str():
+        tests_passed += 1
+    
     # Summary
     print("\n" + "="*50)
     print(f"TEST SUMMARY: {tests_passed}/{tests_total} tests passed")
@@ -113,9 +113,69 @@ Best regards,
     print("\n✅ All tests passed successfully!")
     return True
 
+def test_clean_email_encoding():
+    """Pin clean_email_encoding to the output of the original chained replaces"""
+    print("Testing clean_email_encoding...")
+    
+    cases = [
+        # (input, expected)
+        ("Hello=20World", "Hello World"),
+        ("a=3Db", "a=b"),
+        ("=22quoted=22 =2C =40", '"quoted" , @'),
+        ("line one=\nline two", "line oneline two"),      # soft line break
+        ("win=\r\nline", "winline"),                      # soft line break (Windows)
+        ("mac=\rline", "macline"),                         # soft line break (Mac)
+        ("x=E9y", "x=E9y"),                                # unknown escapes are kept
+        ("trailing=", "trailing"),
+        ("a = b", "a  b"),
+        ("Plain text, no escapes", "Plain text, no escapes"),
+        ("", ""),
+    ]
+    for text, expected in cases:
+        result = efg.clean_email_encoding(text)
+        print(f"   {text!r} -> {result!r}")
+        assert result == expected, f"clean_email_encoding({text!r}) gave {result!r}, expected {expected!r}"
+    
+    print("\n✅ clean_email_encoding matches the expected output!")
+    return True
+
+def test_nested_conditional_lines():
+    """Test conditional lines that contain [Conditional:...] placeholders of their own"""
+    print("Testing nested conditional lines...")
+    
+    # A conditional line with a nested conditional and a variable
+    conditional_lines = {
+        "Promo": "Offer for [Name] [Conditional:Extra]",
+        "Extra": "(extra)",
+    }
+    body = efg.fill_body({"Name": "Ann", "Promo": 1, "Extra": 1}, "Hi [Name]\n[Conditional:Promo]", ["Name"], conditional_lines)
+    print(f"   Nested: {body!r}")
+    assert body == "Hi Ann\nOffer for Ann (extra)", "Nested conditional was not expanded"
+    
+    # The nested line follows its own flag
+    body = efg.fill_body({"Name": "Ann", "Promo": 1, "Extra": 0}, "Hi [Name]\n[Conditional:Promo]", ["Name"], conditional_lines)
+    assert body == "Hi Ann\nOffer for Ann ", "Nested conditional with flag 0 should be removed"
+    
+    # A chain is expanded CONDITIONAL_MAX_DEPTH (3) levels deep, then left as-is
+    chain = {
+        "A": "a [Conditional:B]",
+        "B": "b [Conditional:C]",
+        "C": "c [Conditional:D]",
+        "D": "d",
+    }
+    assert efg.CONDITIONAL_MAX_DEPTH == 3
+    body = efg.fill_body({key: 1 for key in chain}, "Start [Conditional:A] end", [], chain)
+    print(f"   Chain: {body!r}")
+    assert body == "Start a b c [Conditional:D] end", "Chain should stop after 3 levels"
+    
+    print("\n✅ Nested conditional lines expanded correctly!")
+    return True
+
 if __name__ == "__main__":
     try:
         test_template_manager()
+        test_clean_email_encoding()
+        test_nested_conditional_lines()
     except AssertionError as e:
         print(f"\n❌ Test failed: {e}")
         exit(1)